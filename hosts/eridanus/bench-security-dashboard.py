@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# hosts/eridanus/bench-security-dashboard.py
+#
+# Benchmark harness for generate-security-dashboard.py.
+#
+# Puts fake `ssh`, `aureport`, `ausearch` and `uptime` first on PATH
+# (configurable latency, output size and failure rate), points the dashboard
+# at N synthetic hosts, a synthetic AIDE log and a scratch output directory,
+# and reports wall time, peak RSS and render time per fleet size. Each fleet
+# size runs in its own interpreter so peak RSS isn't inherited from the
+# previous one.
+#
+#   ./bench-security-dashboard.py                        # 5, 50, 500 hosts
+#   ./bench-security-dashboard.py --hosts 50 --latency 0.2 --fail-rate 0.1
+#   ./bench-security-dashboard.py --save-baseline base.json
+#   ./bench-security-dashboard.py --compare base.json    # exit 1 on regression
+
+import argparse
+import importlib.util
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+DASHBOARD = Path(__file__).with_name("generate-security-dashboard.py")
+
+# ── Stand-ins ─────────────────────────────────────────────────────────────────
+# Plain sh so 500 hosts don't mean thousands of extra Python interpreters.
+
+FAKE_SSH = r'''#!/bin/sh
+# Skip ssh options up to user@host, then run the remote command locally.
+while [ $# -gt 0 ]; do
+  case "$1" in
+    -i|-o|-p) shift 2 ;;
+    *@*)      shift; break ;;
+    *)        shift ;;
+  esac
+done
+sleep "$BENCH_LATENCY"
+if awk -v r="$BENCH_FAIL_RATE" -v s="$$" 'BEGIN { srand(s); exit !(rand() < r) }'; then
+  echo "ssh: connect to host: Connection timed out" >&2
+  exit 255
+fi
+exec sh -c "$*"
+'''
+
+FAKE_AUREPORT = r'''#!/bin/sh
+today=$(date +%m/%d/%Y)
+case "$*" in
+  *--summary*)
+    echo "Summary Report"
+    echo "======================"
+    echo "Number of changes in configuration: $BENCH_LINES"
+    echo "Number of logins: 42"
+    echo "Number of failed logins: $BENCH_LINES"
+    echo "Number of authentications: 120"
+    echo "Number of failed authentications: $BENCH_LINES"
+    echo "Number of users: 3"
+    echo "Number of events: 123456"
+    ;;
+  *--auth*)
+    echo "Authentication Report"
+    echo "============================================"
+    echo "# date time acct host term exe success event"
+    echo "============================================"
+    seq 1 "$BENCH_LINES" | awk -v d="$today" \
+      '{ printf "%d. %s 00:%02d:%02d root 203.0.113.%d ssh /usr/sbin/sshd no %d\n", $1, d, ($1 / 60) % 60, $1 % 60, $1 % 254 + 1, 1000 + $1 }'
+    ;;
+  *--config*)
+    echo "Config Change Report"
+    echo "==================================="
+    echo "# date time type auid success event"
+    echo "==================================="
+    seq 1 "$BENCH_LINES" | awk -v d="$today" \
+      '{ printf "%d. %s 00:%02d:%02d CONFIG_CHANGE 1000 yes %d\n", $1, d, ($1 / 60) % 60, $1 % 60, 5000 + $1 }'
+    ;;
+esac
+'''
+
+# sudo records inside the 24h window, plus the SSH session records the probe filters out
+FAKE_AUSEARCH = r'''#!/bin/sh
+seq 1 "$BENCH_LINES" | awk -v now="$(date +%s)" \
+  '{ printf "type=USER_CMD msg=audit(%d.%03d:%d): pid=%d uid=1000 auid=1000 msg=\x27cwd=\"/root\" cmd=\"systemctl restart nginx\" exe=\"/run/wrappers/bin/sudo\" terminal=pts/0 res=success\x27\n", now - $1, $1 % 1000, 9000 + $1, 100 + $1;
+     printf "type=USER_START msg=audit(%d.%03d:%d): pid=%d uid=1000 auid=1000 msg=\x27op=PAM:session_open acct=\"root\" exe=\"/run/wrappers/bin/sudo\" terminal=/dev/pts/0 res=success\x27\n", now - $1, $1 % 1000, 19000 + $1, 100 + $1;
+     printf "type=USER_START msg=audit(%d.%03d:%d): pid=%d uid=0 auid=1000 msg=\x27op=PAM:session_open acct=\"monitor\" exe=\"/nix/store/x-openssh/bin/sshd\" hostname=10.0.0.1 addr=10.0.0.1 terminal=ssh res=success\x27\n", now - $1, $1 % 1000, 29000 + $1, 200 + $1 }'
+'''
+
+FAKE_UPTIME = r'''#!/bin/sh
+echo "up 3 days, 4 hours"
+'''
+
+def install_fakes(bin_dir):
+    for name, body in (
+        ("ssh", FAKE_SSH), ("aureport", FAKE_AUREPORT), ("ausearch", FAKE_AUSEARCH),
+        ("uptime", FAKE_UPTIME),
+    ):
+        path = bin_dir / name
+        path.write_text(body)
+        path.chmod(0o755)
+
+def write_aide_log(path, lines):
+    """An aide-check log: one clean run, then a report with `lines` changed files."""
+    entries = "".join(f"f   ...    .C... : /etc/bench/file{i}\n" for i in range(lines))
+    path.write_text(
+        "2024-01-01: AIDE check passed - no unexpected changes\n"
+        "2024-01-02: AIDE found unexpected change(s):\n"
+        "AIDE found differences between database and filesystem!!\n\n"
+        "---------------------------------------------------\n"
+        "Changed entries:\n"
+        "---------------------------------------------------\n\n"
+        + entries
+    )
+
+# ── Single run ────────────────────────────────────────────────────────────────
+
+def load_dashboard():
+    spec = importlib.util.spec_from_file_location("security_dashboard", DASHBOARD)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def run_single(n_hosts, args):
+    """Benchmark one fleet size in this process and return the result dict."""
+    with tempfile.TemporaryDirectory(prefix="dash-bench-") as tmp:
+        tmp = Path(tmp)
+        bin_dir = tmp / "bin"
+        bin_dir.mkdir()
+        install_fakes(bin_dir)
+        write_aide_log(tmp / "aide.log", args.lines)
+        os.environ["PATH"] = f"{bin_dir}:{os.environ['PATH']}"
+        os.environ["BENCH_LATENCY"]   = str(args.latency)
+        os.environ["BENCH_FAIL_RATE"] = str(args.fail_rate)
+        os.environ["BENCH_LINES"]     = str(args.lines)
+
+        dash = load_dashboard()
+        dash.OUTPUT_DIR          = tmp
+        dash.OUTPUT_FILE         = tmp / "index.html"
+        dash.STATE_FILE          = tmp / "state.json"
+        dash.CACHE_FILE          = tmp / "host-cache.json"
+        dash.METRICS_DB          = tmp / "metrics.sqlite"
+        dash.REPORTS_DIR         = tmp / "reports"
+        dash.TRACE_FILE          = tmp / "trace.json"
+        dash.PROM_FILE           = tmp / "security_dashboard.prom"
+        dash.AIDE_LOG            = str(tmp / "aide.log")
+        dash.SSH_CONTROL_PERSIST = None
+        dash.COLLECT_WORKERS     = args.workers
+        dash.RUN_DEADLINE        = args.deadline
+        dash.BATCH_PROBES        = not args.no_batch
+        dash.HOSTS = [
+            {"name": f"bench{i:04d}", "ip": f"10.99.{i // 250}.{i % 250 + 1}", "port": 22, "local": False}
+            for i in range(n_hosts)
+        ]
+
+        state, cache = {}, {}
+        devnull = open(os.devnull, "w")
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            dash.start_trace()
+            t0 = time.perf_counter()
+            host_data = dash.collect_with_cache(dash.HOSTS, state, cache)
+            t1 = time.perf_counter()
+            trends = dash.update_history(host_data)
+            t2 = time.perf_counter()
+            html = dash.render_html(host_data, trends)
+            t3 = time.perf_counter()
+            dash.OUTPUT_FILE.write_text(html)
+            dash.write_trace(host_data)
+        finally:
+            sys.stdout = stdout
+            devnull.close()
+
+        trace = json.loads(dash.TRACE_FILE.read_text())
+        return {
+            "hosts":           n_hosts,
+            "reachable":       sum(1 for h in host_data if h["reachable"]),
+            "collect_s":       round(t1 - t0, 3),
+            "history_s":       round(t2 - t1, 3),
+            "render_s":        round(t3 - t2, 4),
+            "html_bytes":      len(html.encode()),
+            "remote_calls":    sum(1 for c in trace["calls"] if not c["in_batch"]),
+            "remote_bytes":    sum(c["bytes"] for c in trace["calls"] if not c["in_batch"]),
+            "peak_rss_kb":     resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            "child_rss_kb":    resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+        }
+
+# ── Driver ────────────────────────────────────────────────────────────────────
+
+COLUMNS = [
+    ("hosts", "hosts"), ("reachable", "ok"), ("collect_s", "collect s"),
+    ("history_s", "history s"), ("render_s", "render s"), ("html_bytes", "html B"),
+    ("remote_calls", "calls"), ("remote_bytes", "remote B"), ("peak_rss_kb", "RSS KiB"),
+]
+# Lower is better for all of these; compared against --compare baselines.
+# Changes smaller than the noise floor are never reported.
+REGRESSION_KEYS = {"collect_s": 0.02, "render_s": 0.005, "peak_rss_kb": 2048, "html_bytes": 0}
+
+def print_table(results):
+    widths = [max(len(title), *(len(str(r[key])) for r in results)) for key, title in COLUMNS]
+    print("  ".join(title.rjust(w) for (_, title), w in zip(COLUMNS, widths)))
+    for r in results:
+        print("  ".join(str(r[key]).rjust(w) for (key, _), w in zip(COLUMNS, widths)))
+
+def compare(results, baseline, tolerance):
+    """Print regressions against a saved baseline. Returns True if any."""
+    base = {r["hosts"]: r for r in baseline["results"]}
+    regressed = False
+    for r in results:
+        b = base.get(r["hosts"])
+        if b is None:
+            continue
+        for key, floor in REGRESSION_KEYS.items():
+            if b.get(key) and r[key] > b[key] * (1 + tolerance) and r[key] - b[key] > floor:
+                print(f"REGRESSION {r['hosts']} hosts: {key} {b[key]} -> {r[key]}")
+                regressed = True
+    return regressed
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the security dashboard against fake hosts.")
+    parser.add_argument("--hosts", default="5,50,500", help="comma-separated fleet sizes")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds added to every fake ssh call")
+    parser.add_argument("--lines", type=int, default=50, help="rows in each fake aureport/ausearch report")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of fake ssh calls that fail")
+    parser.add_argument("--workers", type=int, default=8, help="COLLECT_WORKERS for the run")
+    parser.add_argument("--deadline", type=float, default=600, help="RUN_DEADLINE for the run")
+    parser.add_argument("--no-batch", action="store_true", help="one ssh call per probe (BATCH_PROBES off)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--save-baseline", metavar="PATH", help="write results as a baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare against a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown vs. baseline")
+    parser.add_argument("--single", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single is not None:
+        print(json.dumps(run_single(args.single, args)))
+        return
+
+    passthrough = [
+        "--latency", str(args.latency), "--lines", str(args.lines),
+        "--fail-rate", str(args.fail_rate), "--workers", str(args.workers),
+        "--deadline", str(args.deadline), *(["--no-batch"] if args.no_batch else []),
+    ]
+    results = []
+    for n in (int(x) for x in args.hosts.split(",")):
+        out = subprocess.run(
+            [sys.executable, __file__, *passthrough, "--single", str(n)],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        results.append(json.loads(out.strip().splitlines()[-1]))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(results)
+
+    config = {k: getattr(args, k) for k in ("latency", "lines", "fail_rate", "workers", "no_batch")}
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps({"config": config, "results": results}, indent=2))
+        print(f"Baseline saved to {args.save_baseline}")
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        if baseline.get("config") != config:
+            print(f"Note: baseline config differs: {baseline.get('config')}")
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+        print("No regressions against baseline")
+
+if __name__ == "__main__":
+    main()
@@ -6,21 +6,47 @@
 #   - Reading local auditd + aide logs on eridanus itself
 #   - Rendering a unified HTML page at /var/lib/security-dashboard/index.html
 #
-# Runs every 15 minutes via systemd timer (security-dashboard.service).
+# Runs as a resident daemon (--daemon) or every 15 minutes via systemd timer
+# (security-dashboard.service). Hosts may also push their own reports
+# (--agent URL on the host, received by the daemon or --receive).
 
+import argparse
+import hashlib
+import hmac
+import math
+import socket
 import subprocess
+import zlib
+import copy
+import gzip
 import json
 import re
 import os
+import pwd
+import secrets
+import shlex
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
 from collections import defaultdict
+from threading import Lock, Thread
+from urllib import request as urlrequest
 
 OUTPUT_DIR  = Path("/var/lib/security-dashboard")
 OUTPUT_FILE = OUTPUT_DIR / "index.html"
 STATE_FILE  = OUTPUT_DIR / "state.json"
+CACHE_FILE  = OUTPUT_DIR / "host-cache.json"
+METRICS_DB  = OUTPUT_DIR / "metrics.sqlite"
 
 # ── Host definitions ──────────────────────────────────────────────────────────
+# The fleet normally comes from INVENTORY_FILE (generated by
+# security-dashboard.nix); HOSTS is the fallback when it is missing.
+INVENTORY_FILE = Path("/etc/security-dashboard/hosts.json")
+
 HOSTS = [
     {"name": "eridanus",   "ip": "localhost",    "port": 22,    "local": True  },
     {"name": "orion",      "ip": "10.40.10.1",   "port": 22,    "local": False },
@@ -37,6 +63,92 @@ SSH_OPTS = [
     "-o", "BatchMode=yes",
     "-o", "LogLevel=ERROR",
 ]
+SSH_UNREACHABLE = "unreachable"   # error prefix when ssh itself exits 255
+
+# ── Collection tuning ─────────────────────────────────────────────────────────
+COLLECT_WORKERS   = 8     # hosts collected in parallel
+PER_HOST_PROBES   = 2     # concurrent probes (SSH sessions) against one host
+RUN_DEADLINE      = 90    # seconds — hosts still running after this render as timed out
+BATCH_PROBES      = True  # ship all of a host's probes through one SSH session
+BATCH_TIMEOUT     = 30    # seconds for a whole batched probe run
+
+# Timer-mode scheduling. Hosts with an inventory "interval" longer than
+# RUN_INTERVAL are spread over that many runs; "critical" hosts run every time.
+RUN_INTERVAL      = 900   # seconds between timer runs
+MAX_HOSTS_PER_RUN = 50    # non-critical hosts polled per run, most overdue first
+
+# Last good result per host, kept in CACHE_FILE
+HOST_CACHE_TTL       = 600     # seconds — hosts collected more recently are not polled again
+HOST_CACHE_MAX_STALE = 86400   # seconds — how long last-known data stands in for a failed host
+
+# ── Daemon mode (--daemon) ────────────────────────────────────────────────────
+# Seconds between runs of each probe; all probes due for a host share one batch.
+PROBE_INTERVALS = {
+    "failed_logins":  60,
+    "config_changes": 300,
+    "uptime":         300,
+    "audit_summary":  3600,
+    "aide":           3600,
+    "sudo":           300,
+}
+DAEMON_METRICS_INTERVAL = 900   # seconds between history samples, as in timer mode
+DAEMON_REFRESH          = 60    # page meta-refresh while the daemon is running
+
+# Metrics history in METRICS_DB: raw samples per run, downsampled to hourly buckets
+METRICS_RAW_DAYS    = 2
+METRICS_HOURLY_DAYS = 35
+TREND_METRICS       = ("failed_logins", "config_changes")
+
+# Reuse SSH connections between runs (ControlMaster). Set to None to disable.
+SSH_CONTROL_DIR     = OUTPUT_DIR / "ssh-mux"
+SSH_CONTROL_PERSIST = "20m"
+
+# ── Incremental audit collection ──────────────────────────────────────────────
+# aureport probes only ask for events since the last run's checkpoint; the
+# rolling window is kept per host in STATE_FILE and merged locally. The sudo
+# probe does the same with its privilege tally (merge_privilege_window).
+INCREMENTAL_PROBES       = ("failed_logins", "config_changes")
+AUDIT_WINDOW_HOURS       = 24
+AUDIT_CHECKPOINT_OVERLAP = 300                   # seconds re-read before the checkpoint
+AUDIT_TIME_FORMAT        = "%m/%d/%Y %H:%M:%S"   # aureport dates (en_US / C locale)
+AUDIT_HOUR_FORMAT        = "%m/%d/%Y %H"
+
+# Windowed probes keep only the rows the page shows plus per-hour event counts.
+# In a batch that cut happens on the remote host, and the whole batch output is
+# gzipped over SSH, so transfer stays roughly constant however busy a host is.
+AUDIT_ROWS     = {"failed_logins": 5, "config_changes": 10}
+COMPRESS_BATCH = True
+
+# AIDE log, read from the inode + byte offset reached last time (kept per host
+# in STATE_FILE) so each run only fetches what the aide-check service appended
+AIDE_LOG           = "/var/log/aide/aide.log"
+AIDE_SHOWN_CHANGES = 10   # paths listed per host card; every path is kept in the data
+
+# ── Instrumentation ───────────────────────────────────────────────────────────
+# Per-call timings of the last run, as a node_exporter textfile and a JSON trace
+PROM_FILE  = OUTPUT_DIR / "security_dashboard.prom"
+TRACE_FILE = OUTPUT_DIR / "trace.json"
+
+# ── Native audit.log parsing ──────────────────────────────────────────────────
+# Local hosts read the raw audit logs once per run instead of spawning
+# aureport for each probe. Falls back to aureport if the logs can't be read.
+NATIVE_AUDIT_PARSER = True
+AUDIT_LOG_DIR       = Path("/var/log/audit")
+AUDIT_OPEN_EVENTS   = 1024   # events kept open waiting for more records / EOE
+
+# ── Push ingestion ────────────────────────────────────────────────────────────
+# Hosts can run this script with --agent and POST their own report; hosts
+# without a recent report are pulled over SSH as usual.
+INGEST_KEY_FILE   = Path("/persist/etc/security-dashboard/ingest.key")
+INGEST_BIND       = ("0.0.0.0", 8091)
+REPORTS_DIR       = OUTPUT_DIR / "reports"
+REPORT_MAX_AGE    = 1800        # seconds a pushed report replaces pulling
+REPORT_MAX_SKEW   = 300         # seconds between agent send time and receipt
+REPORT_MAX_BYTES  = 1024 * 1024
+# Types a pushed report's data must have before it is stored and rendered
+REPORT_FIELDS     = {"failed_logins": list, "config_changes": list, "event_counts": dict,
+                     "audit_summary": dict, "aide": dict, "uptime": str}
+REPORT_OPTIONAL   = {"sudo": dict, "errors": dict, "tags": list}
 
 # ── State ─────────────────────────────────────────────────────────────────────
 
@@ -52,53 +164,621 @@ def save_state(state):
     except Exception:
         pass
 
+def load_cache():
+    try:
+        return json.loads(CACHE_FILE.read_text())
+    except Exception:
+        return {}
+
+def save_cache(cache):
+    try:
+        CACHE_FILE.write_text(json.dumps(cache))
+    except Exception:
+        pass
+
+# ── Instrumentation ────────────────────────────────────────────────────────────
+
+TRACE      = {"started": time.time(), "calls": []}
+TRACE_LOCK = Lock()
+
+def start_trace():
+    with TRACE_LOCK:
+        TRACE["started"] = time.time()
+        TRACE["calls"] = []
+
+def record_call(host, probe, started, nbytes, exit_status, timed_out, error, duration=None):
+    """Add one timed command to the trace; a `duration` marks a probe timed inside run_batch."""
+    in_batch = duration is not None
+    if duration is None:
+        duration = time.monotonic() - started
+    with TRACE_LOCK:
+        TRACE["calls"].append({
+            "host":        host,
+            "probe":       probe,
+            "offset":      round(time.time() - (time.monotonic() - started) - TRACE["started"], 3),
+            "duration":    round(duration, 3),
+            "bytes":       nbytes,
+            "exit_status": exit_status,
+            "timeout":     timed_out,
+            "error":       error,
+            "in_batch":    in_batch,
+        })
+
+def _prom_escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+def prom_labels(**labels):
+    return "{" + ",".join(f'{k}="{_prom_escape(v)}"' for k, v in labels.items()) + "}"
+
+def prom_value(value):
+    """Sample value without :g's six-significant-digit rounding."""
+    return repr(value) if isinstance(value, float) else str(int(value))
+
+def render_prom(trace, host_data, run_duration):
+    """node_exporter textfile for one run: per host/probe totals plus run info."""
+    totals = {}
+    for call in trace["calls"]:
+        t = totals.setdefault((call["host"], call["probe"]),
+                              {"calls": 0, "duration": 0.0, "bytes": 0, "timeouts": 0, "errors": 0, "exit": 0})
+        t["calls"]    += 1
+        t["duration"] += call["duration"]
+        t["bytes"]    += call["bytes"]
+        t["timeouts"] += call["timeout"]
+        t["errors"]   += call["error"] is not None
+        t["exit"]      = call["exit_status"] if call["exit_status"] is not None else -1
+
+    series = [
+        ("probe_calls",            "gauge", "Commands run for a probe in the last run", "calls"),
+        ("probe_duration_seconds", "gauge", "Wall time spent in a probe in the last run", "duration"),
+        ("probe_bytes",            "gauge", "Output bytes returned by a probe in the last run", "bytes"),
+        ("probe_timeouts",         "gauge", "Probe commands that timed out in the last run", "timeouts"),
+        ("probe_errors",           "gauge", "Probe commands that returned an error in the last run", "errors"),
+        ("probe_exit_status",      "gauge", "Exit status of the last command for a probe (-1: none)", "exit"),
+    ]
+    lines = []
+    for metric, kind, help_text, field in series:
+        lines.append(f"# HELP security_dashboard_{metric} {help_text}")
+        lines.append(f"# TYPE security_dashboard_{metric} {kind}")
+        for (host, probe), t in sorted(totals.items()):
+            lines.append(f"security_dashboard_{metric}{prom_labels(host=host, probe=probe)} {prom_value(t[field])}")
+
+    lines += [
+        "# HELP security_dashboard_host_reachable Whether a host answered in the last run",
+        "# TYPE security_dashboard_host_reachable gauge",
+        *(f'security_dashboard_host_reachable{prom_labels(host=h["name"])} {int(bool(h["reachable"]))}'
+          for h in host_data),
+        "# HELP security_dashboard_run_duration_seconds Wall time of the last collection run",
+        "# TYPE security_dashboard_run_duration_seconds gauge",
+        f"security_dashboard_run_duration_seconds {run_duration:.3f}",
+        "# HELP security_dashboard_last_run_timestamp_seconds Unix time the last run started",
+        "# TYPE security_dashboard_last_run_timestamp_seconds gauge",
+        f'security_dashboard_last_run_timestamp_seconds {trace["started"]:.0f}',
+    ]
+    return "\n".join(lines) + "\n"
+
+def write_trace(host_data):
+    """Write the current trace as TRACE_FILE (JSON) and PROM_FILE (textfile)."""
+    with TRACE_LOCK:
+        trace = {"started": TRACE["started"], "calls": list(TRACE["calls"])}
+    run_duration = time.time() - trace["started"]
+    try:
+        for path, text in (
+            (TRACE_FILE, json.dumps({**trace, "duration": round(run_duration, 3)}, indent=2)),
+            (PROM_FILE, render_prom(trace, host_data, run_duration)),
+        ):
+            # Rename into place so node_exporter never reads a partial file
+            tmp = path.with_name(f".{path.name}.tmp")
+            tmp.write_text(text)
+            tmp.replace(path)
+    except Exception as e:
+        print(f"Warning: could not write run trace: {e}")
+
+# ── Inventory ──────────────────────────────────────────────────────────────────
+
+def load_inventory(path=None):
+    """Host list from INVENTORY_FILE, normalised (see normalise_host); falls back to HOSTS."""
+    path = Path(path or INVENTORY_FILE)
+    try:
+        entries = json.loads(path.read_text())
+    except FileNotFoundError:
+        return [normalise_host(h) for h in HOSTS]
+    except Exception as e:
+        print(f"Warning: could not read inventory {path}: {e} — using built-in HOSTS")
+        return [normalise_host(h) for h in HOSTS]
+
+    hosts = []
+    for entry in entries:
+        if not isinstance(entry, dict) or not entry.get("name") or not entry.get("ip"):
+            print(f"Warning: skipping inventory entry without name/ip: {entry!r}")
+            continue
+        hosts.append(normalise_host(entry))
+    return hosts
+
+def normalise_host(entry):
+    return {
+        "name":     entry["name"],
+        "ip":       entry["ip"],
+        "port":     int(entry.get("port") or 22),
+        "local":    bool(entry.get("local", False)),
+        "tags":     list(entry.get("tags") or []),
+        "priority": entry.get("priority") or "normal",
+        "interval": entry.get("interval"),
+    }
+
+def schedule_hosts(hosts, state, now=None):
+    """Pick this timer run's hosts: critical ones, then due ones by interval slot, most overdue first."""
+    now = now or time.time()
+    run = state.get("run_index", 0)
+    state["run_index"] = run + 1
+    last = state.get("last_polled", {})
+
+    critical, due = [], []
+    for host in hosts:
+        name = host["name"]
+        if host.get("priority") == "critical":
+            critical.append(host)
+            continue
+        interval = host.get("interval") or RUN_INTERVAL
+        slices = max(1, math.ceil(interval / RUN_INTERVAL))
+        if (name not in last
+                or zlib.crc32(name.encode()) % slices == run % slices
+                or now - last[name] >= 2 * interval):
+            due.append(host)
+
+    due.sort(key=lambda h: last.get(h["name"], 0))
+    if len(due) > MAX_HOSTS_PER_RUN:
+        print(f"Deferring {len(due) - MAX_HOSTS_PER_RUN} due hosts to later runs")
+    return critical + due[:MAX_HOSTS_PER_RUN]
+
 # ── Remote command execution ───────────────────────────────────────────────────
 
-def run_remote(host, cmd, timeout=15):
-    """Run a command on a remote host via SSH. Returns (stdout, error)."""
-    if host["local"]:
+def ssh_base(host):
+    """ssh argv prefix for a host, with connection multiplexing if enabled."""
+    cmd = ["ssh", "-i", SSH_KEY, *SSH_OPTS]
+    if SSH_CONTROL_PERSIST:
+        cmd += [
+            "-o", "ControlMaster=auto",
+            "-o", f"ControlPath={SSH_CONTROL_DIR}/%C",
+            "-o", f"ControlPersist={SSH_CONTROL_PERSIST}",
+        ]
+    return cmd + ["-p", str(host["port"]), f"root@{host['ip']}"]
+
+def run_remote(host, cmd, timeout=15, probe=None, compressed=False):
+    """Run a command on a remote host via SSH, timed into the trace. Returns (stdout, error)."""
+    started = time.monotonic()
+    out, err, rc, nbytes, timed_out = "", None, None, 0, False
+    deadline = host.get("deadline")
+    if deadline is not None:
+        timeout = min(timeout, deadline - time.monotonic())
+    if timeout <= 0:
+        err, timed_out = "timeout", True
+    elif host["local"]:
         try:
-            result = subprocess.run(
-                cmd, capture_output=True, text=True, timeout=timeout
-            )
-            return result.stdout, None
+            # Bytes, not text=True: universal newlines would rewrite \r\n
+            result = subprocess.run(cmd, capture_output=True, timeout=timeout)
+            out, rc = result.stdout.decode(errors="replace"), result.returncode
+            nbytes = len(result.stdout) + len(result.stderr)
+        except subprocess.TimeoutExpired as e:
+            err, timed_out = str(e), True
         except Exception as e:
-            return "", str(e)
+            err = str(e)
     else:
         ssh_cmd = [
-            "ssh",
-            "-i", SSH_KEY,
-            *SSH_OPTS,
-            "-p", str(host["port"]),
-            f"root@{host['ip']}",
-            " ".join(cmd) if isinstance(cmd, list) else cmd,
+            *ssh_base(host),
+            shlex.join(cmd) if isinstance(cmd, list) else cmd,
         ]
         try:
-            result = subprocess.run(
-                ssh_cmd, capture_output=True, text=True, timeout=timeout
-            )
-            if result.returncode != 0 and not result.stdout:
-                return "", result.stderr.strip()
-            return result.stdout, None
+            result = subprocess.run(ssh_cmd, capture_output=True, timeout=timeout)
+            rc, nbytes = result.returncode, len(result.stdout) + len(result.stderr)
+            stdout = result.stdout
+            if compressed and stdout:
+                stdout = gzip.decompress(stdout)
+            stdout = stdout.decode(errors="replace")
+            if result.returncode == 255:
+                # ssh's own failure (refused, timed out, auth), not the command's
+                err = f'{SSH_UNREACHABLE}: {result.stderr.decode(errors="replace").strip()}'
+            elif result.returncode != 0 and not stdout:
+                err = result.stderr.decode(errors="replace").strip()
+            else:
+                out = stdout
         except subprocess.TimeoutExpired:
-            return "", "timeout"
+            err, timed_out = "timeout", True
         except Exception as e:
-            return "", str(e)
+            err = str(e)
+
+    record_call(host["name"], probe or "command", started, nbytes, rc, timed_out, err)
+    return out, err
+
+def probe_failed(name, result):
+    """Whether a parsed probe result carries an error."""
+    return result == "unknown" if name == "uptime" else bool(result[1])
+
+def run_batch(host, names, timeout=BATCH_TIMEOUT):
+    """Run several probes in one SSH session, split apart by token markers. Returns {probe: (stdout, error)}."""
+    token = secrets.token_hex(8)
+    script = []
+    for name in names:
+        probe_cmd = shlex.join(probe_command(host, name))
+        script.append(f"echo \"@@{token} {name} $(date +%s.%N)\"")
+        if name in AUDIT_ROWS:
+            # Report aureport's exit status, not the filter's
+            script.append(f"out=$({probe_cmd} 2>/dev/null); rc=$?")
+            script.append(f"printf '%s\\n' \"$out\" | {audit_row_filter(name)}")
+        else:
+            script.append(f"{probe_cmd} 2>/dev/null; rc=$?")
+        # The output may not end in a newline; the one added here is dropped again
+        script.append(f"echo; echo \"@@{token} rc $rc $(date +%s.%N)\"")
+    body = "; ".join(script)
+    compressed = COMPRESS_BATCH and not host["local"]
+    if compressed:
+        body = f"{{ {body}; }} | gzip -c"
+    cmd = ["sh", "-c", body]
+    if not host["local"]:
+        cmd = shlex.join(cmd)
+
+    started = time.monotonic()
+    out, err = run_remote(host, cmd, timeout=timeout, probe="batch", compressed=compressed)
+    if err:
+        return {name: ("", err) for name in names}
+
+    def clock(text):
+        try:
+            return float(text)
+        except ValueError:
+            return None   # no %N in this date
+
+    # Not splitlines(): that also splits on \r and \x1d, which can be in the output
+    outputs, current, lines, first, began = {}, None, [], None, None
+    for line in out.split("\n"):
+        if line.startswith(f"@@{token} rc "):
+            if current is not None:
+                _, _, rc, ended = (line.split(" ") + [""])[:4]
+                text = "\n".join(lines)
+                error = None if rc == "0" or text.strip() else f"exit status {rc}"
+                outputs[current] = (text, error)
+                ended = clock(ended)
+                if began is not None and ended is not None:
+                    record_call(host["name"], current, started + began - first, len(text.encode()),
+                                int(rc) if rc.isdigit() else None, False, error, ended - began)
+            current, lines = None, []
+        elif line.startswith(f"@@{token} "):
+            _, current, began = (line.split(" ") + [""])[:3]
+            began = clock(began)
+            if first is None:
+                first = began
+            lines = []
+        elif current is not None:
+            lines.append(line)
+
+    return {name: outputs.get(name, ("", "no output")) for name in names}
+
+def audit_row_filter(probe):
+    """awk cutting aureport rows down to "hour <hour> <count>" lines and the newest rows."""
+    program = (
+        '/^ *[0-9]+\\./ { split($3, t, ":"); h[$2 " " t[1]]++; r[++c % n] = $0 } '
+        'END { for (k in h) print "hour " k " " h[k]; '
+        'for (i = (c > n ? c - n + 1 : 1); i <= c; i++) print r[i % n] }'
+    )
+    return f"awk -v n={AUDIT_ROWS[probe]} {shlex.quote(program)}"
 
 # ── Data collection ────────────────────────────────────────────────────────────
+#
+# Each probe is a command plus a parser. run_probe runs one on its own;
+# collect_host_data normally ships all of them through run_batch instead.
+
+PROBE_COMMANDS = {
+    "failed_logins":  ["aureport", "--auth", "--failed",
+                       "--start", "yesterday", "--end", "now", "-i"],
+    "config_changes": ["aureport", "--config",
+                       "--start", "yesterday", "--end", "now", "-i"],
+    "audit_summary":  ["aureport", "--summary", "-i"],
+    "aide":           ["sh", "-c",
+                       's=$(stat -Lc "%i %s" {log}) || exit 1; set -- $s; '
+                       'if [ "$1" = "{inode}" ] && [ "$2" -ge {offset} ]; then skip={offset}; else skip=0; fi; '
+                       'echo "aide-log $1 $skip"; tail -c +$((skip + 1)) {log} | head -c $(($2 - skip)); '
+                       'echo; echo aide-end'],
+    "uptime":         ["uptime", "-p"],
+    # Only sudo/su/doas records (PRIVILEGE_EXES) leave the host; USER_START
+    # also fires for every SSH login, the dashboard's own included
+    "sudo":           ["sh", "-c",
+                       'out=$(ausearch --start {start} --end now '
+                       '-m USER_AUTH,USER_CMD,USER_START --raw); rc=$?; '
+                       'printf "%s\\n" "$out" | grep -E {exes}; exit $rc'],
+}
+
+# ── Native audit.log parsing ───────────────────────────────────────────────────
+
+AUDIT_RECORD_RE = re.compile(r'^type=(\S+) msg=audit\((\d+)(?:\.\d+)?:(\d+)\): ?(.*)$')
+AUDIT_FIELD_RE  = re.compile(r'(\w+)=("[^"]*"|\S+)')
+AUDIT_NATIVE_PROBES = ("failed_logins", "config_changes", "audit_summary", "sudo")
+CONFIG_EVENT_TYPES  = {
+    "CONFIG_CHANGE", "DAEMON_CONFIG", "USYS_CONFIG", "NETFILTER_CFG",
+    "MAC_CONFIG_CHANGE", "MAC_POLICY_LOAD", "MAC_STATUS",
+}
+
+def audit_log_files(log_dir=None):
+    """audit.log plus its numbered rotations, oldest first."""
+    log_dir = Path(log_dir or AUDIT_LOG_DIR)
+    rotated = []
+    for path in log_dir.glob("audit.log.*"):
+        suffix = path.name.rsplit(".", 1)[-1]
+        if suffix.isdigit():
+            rotated.append((int(suffix), path))
+    files = [path for _, path in sorted(rotated, reverse=True)]
+    if (log_dir / "audit.log").exists():
+        files.append(log_dir / "audit.log")
+    return files
+
+def audit_field(key, value):
+    """Unquote a record field; unquoted account names and commands are hex-encoded."""
+    value = value.strip("'")
+    if value.startswith('"') and value.endswith('"'):
+        return value[1:-1]
+    if key in ("acct", "cmd") and re.fullmatch(r'(?:[0-9A-F]{2})+', value):
+        return bytes.fromhex(value).decode(errors="replace")
+    return value
+
+def audit_line_records(lines):
+    """Yield (type, epoch, serial, fields) for every raw record line."""
+    for line in lines:
+        m = AUDIT_RECORD_RE.match(line)
+        if not m:
+            continue
+        rtype, ts, serial, rest = m.groups()
+        fields = {k: audit_field(k, v) for k, v in AUDIT_FIELD_RE.findall(rest)}
+        yield rtype, int(ts), int(serial), fields
+
+AUDIT_LINE_TS_RE = re.compile(rb'msg=audit\((\d+)')
+
+def audit_log_lines(path, start=None, index=None):
+    """Complete lines of an audit log, seeking to `start`'s hour through `index` (inode -> hour -> offset)."""
+    st = path.stat()
+    hours = {} if index is None else index.setdefault(str(st.st_ino), {})
+    offset = 0
+    if start is not None:
+        hour = int(start) // 3600 * 3600
+        known = [int(h) for h in hours if int(h) <= hour]
+        if known:
+            offset = hours[str(max(known))]
+    if offset > st.st_size:
+        hours.clear()  # truncated in place
+        offset = 0
+    with open(path, "rb") as f:
+        f.seek(offset)
+        last = None
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break  # still being written; read again next time
+            if m := AUDIT_LINE_TS_RE.search(raw, 0, 80):
+                hour = int(m.group(1)) // 3600 * 3600
+                if hour != last:
+                    hours.setdefault(str(hour), offset)
+                    last = hour
+            offset += len(raw)
+            yield raw.decode(errors="replace")
+
+def audit_records(paths, start=None, index=None):
+    """audit_line_records over log files, streaming (see audit_log_lines)."""
+    for path in paths:
+        yield from audit_line_records(audit_log_lines(path, start, index))
+
+def audit_events(records, open_limit=AUDIT_OPEN_EVENTS):
+    """Assemble records into (epoch, serial, [(type, fields), ...]) events, at most `open_limit` open."""
+    pending = {}
+    for rtype, ts, serial, fields in records:
+        if rtype == "EOE":
+            if serial in pending:
+                yield pending.pop(serial)
+            continue
+        event = pending.setdefault(serial, (ts, serial, []))
+        event[2].append((rtype, fields))
+        if len(pending) > open_limit:
+            yield pending.pop(next(iter(pending)))
+    yield from pending.values()
+
+# ── Privilege escalation ──────────────────────────────────────────────────────
+
+PRIVILEGE_EXES  = {"sudo", "su", "doas"}
+PRIVILEGE_TOP_N = 5
+
+def audit_user(fields, key, resolve=False):
+    """Account name for a uid/auid field: the enriched name, else the id (looked up with `resolve`)."""
+    value = fields.get(key.upper()) or fields.get(key, "?")
+    if value.isdigit() and resolve:
+        try:
+            return pwd.getpwuid(int(value)).pw_name
+        except KeyError:
+            pass
+    return value
+
+def new_privilege(resolve=False):
+    return {"resolve": resolve, "failed": {}, "commands": {}, "targets": {}}
+
+def tally_privilege(tally, ts, serial, records):
+    """Fold one audit event into a privilege tally (see summarise_privilege)."""
+    for rtype, fields in records:
+        exe = os.path.basename(fields.get("exe", ""))
+        if exe not in PRIVILEGE_EXES:
+            continue
+        pid = fields.get("pid", str(serial))
+        if rtype == "USER_AUTH" and fields.get("res") == "failed":
+            tally["failed"][f"{ts}:{serial}"] = ts
+        elif rtype == "USER_START":
+            tally["targets"][pid] = fields.get("acct", "?")
+            if exe != "sudo" and pid not in tally["commands"]:
+                tally["commands"][pid] = (ts, audit_user(fields, "auid", tally["resolve"]), f"({exe} session)")
+        elif rtype == "USER_CMD":
+            user = audit_user(fields, "auid", tally["resolve"])
+            if user in ("?", "unset", "4294967295"):
+                user = audit_user(fields, "uid", tally["resolve"])
+            tally["commands"][pid] = (ts, user, fields.get("cmd", "?"))
+
+def summarise_privilege(tally, top_n=PRIVILEGE_TOP_N):
+    """Counts and top-N tables from a privilege tally; targets are joined to commands by pid."""
+    by_user, by_command, by_target = defaultdict(int), defaultdict(int), defaultdict(int)
+    recent = []
+    for pid, (ts, user, cmd) in tally["commands"].items():
+        target = tally["targets"].get(pid, "root")
+        by_user[user] += 1
+        by_command[cmd] += 1
+        by_target[target] += 1
+        recent.append((ts, user, target, cmd))
+
+    def top(counts):
+        return sorted(counts.items(), key=lambda kv: (-kv[1], kv[0]))[:top_n]
+
+    return {
+        "total":      len(tally["commands"]),
+        "failed":     len(tally["failed"]),
+        "by_user":    top(by_user),
+        "by_command": top(by_command),
+        "by_target":  top(by_target),
+        "recent": [
+            {"time": datetime.fromtimestamp(ts).strftime(AUDIT_TIME_FORMAT),
+             "user": user, "target": target, "cmd": cmd}
+            for ts, user, target, cmd in sorted(recent)[-top_n:]
+        ],
+    }
 
-def get_failed_logins(host):
-    """Get failed login attempts in the last 24h."""
-    out, err = run_remote(host, [
-        "aureport", "--auth", "--failed",
-        "--start", "yesterday", "--end", "now", "-i"
-    ])
+def parse_sudo(out, err):
+    """Tally `ausearch --raw` output for privilege escalation (see merge_privilege_window)."""
+    if err and (err == "exit status 1" or "no matches" in err):
+        err = None  # ausearch exits 1 when nothing matched
+    tally = new_privilege()
     if err:
-        return [], err
-    lines = []
+        return tally, err
+    # Not splitlines(): enriched records separate their name fields with \x1d
+    for ts, serial, records in audit_events(audit_line_records(out.split("\n"))):
+        tally_privilege(tally, ts, serial, records)
+    return tally, None
+
+def merge_privilege_window(window, new, now):
+    """Merge a privilege tally into the host's 24h window (in place) and return it summarised."""
+    cutoff = (now - timedelta(hours=AUDIT_WINDOW_HOURS)).timestamp()
+    commands = {**window.get("commands", {}), **new["commands"]}
+    commands = {pid: c for pid, c in commands.items() if c[0] >= cutoff}
+    targets = {**window.get("targets", {}), **new["targets"]}
+    failed = {**window.get("failed", {}), **new["failed"]}
+    window.update(
+        commands=commands,
+        targets={pid: acct for pid, acct in targets.items() if pid in commands},
+        failed={key: ts for key, ts in failed.items() if ts >= cutoff},
+        checkpoint=(now - timedelta(seconds=AUDIT_CHECKPOINT_OVERLAP)).strftime(AUDIT_TIME_FORMAT),
+    )
+    return summarise_privilege(window)
+
+def parse_audit_logs(paths, since=None, now=None, names=None, index=None):
+    """Audit probe results from raw logs; read in full only when `names` includes audit_summary."""
+    now = now or datetime.now()
+    names = [n for n in (names or AUDIT_NATIVE_PROBES) if n in AUDIT_NATIVE_PROBES]
+    default_start = now - timedelta(hours=AUDIT_WINDOW_HOURS)
+
+    def start_of(probe):
+        try:
+            return datetime.strptime((since or {})[probe], AUDIT_TIME_FORMAT).timestamp()
+        except (KeyError, ValueError):
+            return default_start.timestamp()
+
+    logins_from = start_of("failed_logins")
+    config_from = start_of("config_changes")
+    sudo_from   = start_of("sudo")
+    privilege   = new_privilege(resolve=True)
+
+    read_from = None
+    if "audit_summary" not in names:
+        read_from = min(start_of(n) for n in names)
+        paths = [p for p in paths if p.stat().st_mtime >= read_from]
+    if index is not None:
+        # Forget rotated-away files and hours no window reaches back to
+        live = {str(p.stat().st_ino) for p in paths} if read_from is None else None
+        oldest = default_start.timestamp() - 3600
+        for inode in list(index):
+            if live is not None and inode not in live:
+                del index[inode]
+                continue
+            index[inode] = {h: o for h, o in index[inode].items() if int(h) >= oldest}
+
+    counts = defaultdict(int)
+    unique = defaultdict(set)
+    failed_logins, config_changes = [], []
+
+    for ts, serial, records in audit_events(audit_records(paths, read_from, index)):
+        counts["events"] += 1
+        when = datetime.fromtimestamp(ts).strftime(AUDIT_TIME_FORMAT)
+        if ts >= sudo_from:
+            tally_privilege(privilege, ts, serial, records)
+        for rtype, fields in records:
+            result = fields.get("res", fields.get("success", ""))
+            failed = result in ("failed", "no", "0")
+            for field, key in (("auid", "users"), ("terminal", "terminals"),
+                               ("hostname", "host names"), ("exe", "executables"),
+                               ("key", "keys"), ("pid", "process IDs")):
+                value = fields.get(field)
+                if value and value not in ("?", "(null)", "4294967295"):
+                    unique[key].add(value)
+
+            if rtype == "USER_LOGIN":
+                counts["failed logins" if failed else "logins"] += 1
+            elif rtype == "USER_AUTH":
+                counts["failed authentications" if failed else "authentications"] += 1
+                if failed and ts >= logins_from:
+                    failed_logins.append({
+                        "time":   when,
+                        "user":   fields.get("acct", "?"),
+                        "host":   fields.get("hostname") or fields.get("addr", "?"),
+                        "exe":    fields.get("exe", "?"),
+                        "result": "failed",
+                        "event":  str(serial),
+                    })
+            elif rtype in CONFIG_EVENT_TYPES:
+                counts["changes in configuration"] += 1
+                if ts >= config_from:
+                    config_changes.append(
+                        f'{when} {rtype} {fields.get("auid", "?")} '
+                        f'{"no" if failed else "yes"} {serial}'
+                    )
+            elif rtype == "SYSCALL" and fields.get("success") == "no":
+                counts["failed syscalls"] += 1
+            elif rtype.startswith("ANOM_"):
+                counts["anomaly events"] += 1
+
+    summary = dict(counts)
+    summary.update({key: len(values) for key, values in unique.items()})
+    parsed = {
+        "failed_logins":  (audit_rows("failed_logins", failed_logins), None),
+        "config_changes": (audit_rows("config_changes", config_changes), None),
+        "audit_summary":  (summary, None),
+        "sudo":           (privilege, None),
+    }
+    return {n: parsed[n] for n in names}
+
+def probe_command(host, name):
+    """Command for a probe, narrowed to the host's audit checkpoint or AIDE log position."""
+    cmd = PROBE_COMMANDS[name]
+    since = host.get("audit_since", {}).get(name)
+    if since and "yesterday" in cmd:
+        i = cmd.index("yesterday")
+        cmd = cmd[:i] + since.split() + cmd[i + 1:]
+    if name == "sudo":
+        exes = f'exe="([^"]*/)?({"|".join(sorted(PRIVILEGE_EXES))})"'
+        start = shlex.join(since.split()) if since else "yesterday"
+        cmd = cmd[:2] + [cmd[2].format(start=start, exes=shlex.quote(exes))]
+    if name == "aide":
+        inode, offset = host.get("aide_from") or (None, 0)
+        cmd = cmd[:2] + [cmd[2].format(log=shlex.quote(AIDE_LOG), inode=inode or "", offset=int(offset))]
+    return cmd
+
+AUDIT_HOUR_RE = re.compile(r'^hour (\d\d/\d\d/\d{4} \d\d) (\d+)$')
+
+def parse_failed_logins(out, err):
+    if err:
+        return audit_rows("failed_logins", [], {}), err
+    lines, hours = [], {}
     for line in out.splitlines():
+        if m := AUDIT_HOUR_RE.match(line):
+            hours[m.group(1)] = int(m.group(2))
         # Skip header lines
-        if re.match(r'^\d+\.', line.strip()):
+        elif re.match(r'^\d+\.', line.strip()):
             parts = line.strip().split()
             if len(parts) >= 6:
                 lines.append({
@@ -107,28 +787,23 @@ def get_failed_logins(host):
                     "host":    parts[4],
                     "exe":     parts[5],
                     "result":  parts[6] if len(parts) > 6 else "failed",
+                    "event":   parts[-1],
                 })
-    return lines, None
-
-def get_sudo_usage(host):
-    """Get sudo/privilege escalation events in the last 24h."""
-    out, err = run_remote(host, [
-        "ausearch", "--start", "yesterday",
-        "-m", "USER_AUTH,USER_CMD,CRED_ACQ",
-        "--key", "root-exec",
-        "-i", "--format", "text"
-    ])
+    return audit_rows("failed_logins", lines, hours), None
+
+def parse_config_changes(out, err):
     if err:
-        return [], err
-    events = []
+        return audit_rows("config_changes", [], {}), err
+    lines, hours = [], {}
     for line in out.splitlines():
-        if "sudo" in line.lower() or "su" in line.lower():
-            events.append(line.strip())
-    return events[:20], None  # cap at 20
+        if m := AUDIT_HOUR_RE.match(line):
+            hours[m.group(1)] = int(m.group(2))
+        elif re.match(r'^\d+\.', line.strip()):
+            # Drop aureport's per-report row number so lines compare across runs
+            lines.append(line.strip().split(None, 1)[-1])
+    return audit_rows("config_changes", lines, hours), None
 
-def get_audit_summary(host):
-    """Get aureport summary stats."""
-    out, err = run_remote(host, ["aureport", "--summary", "-i"])
+def parse_audit_summary(out, err):
     if err:
         return {}, err
     summary = {}
@@ -139,83 +814,600 @@ def get_audit_summary(host):
                 summary[m.group(1).strip()] = int(m.group(2))
     return summary, None
 
-def get_config_changes(host):
-    """Get system config changes in the last 24h."""
-    out, err = run_remote(host, [
-        "aureport", "--config",
-        "--start", "yesterday", "--end", "now", "-i"
-    ])
+AIDE_UNKNOWN   = {"status": "unknown", "last_check": "never", "changes": []}
+AIDE_HEADER_RE = re.compile(r'^(\d{4}-\d\d-\d\d): (.*)$')
+AIDE_ENTRY_RE  = re.compile(r'^(?:(added|removed|changed)|[a-zA-Z!?][^:]*): (/.*)$')
+AIDE_SECTIONS  = {"Added entries:": "+", "Removed entries:": "-", "Changed entries:": "~"}
+AIDE_KINDS     = {"added": "+", "removed": "-", "changed": "~"}
+
+def parse_aide_log(out, err):
+    """Split an aide probe read into its position and the newly appended whole lines."""
+    empty = {"inode": None, "start": 0, "end": 0, "text": ""}
     if err:
-        return [], err
-    lines = []
-    for line in out.splitlines():
-        if re.match(r'^\d+\.', line.strip()):
-            lines.append(line.strip())
-    return lines[:10], None
+        return empty, err
+    header, _, text = out.partition("\n")
+    m = re.match(r'^aide-log (\d+) (\d+)$', header)
+    if not m or not text.endswith("\naide-end\n"):
+        return empty, "unexpected aide probe output"
+    inode, start = m.group(1), int(m.group(2))
+    text = text[:-len("\naide-end\n")]
+    text = text[:text.rfind("\n") + 1]
+    return {"inode": inode, "start": start, "end": start + len(text.encode()), "text": text}, None
+
+def fold_aide_log(report, section, text):
+    """Apply newly appended aide.log text to the last report seen. Returns (report, section)."""
+    report = {**report, "changes": list(report["changes"])}
+    for line in text.splitlines():
+        if m := AIDE_HEADER_RE.match(line):
+            day, verdict = m.groups()
+            section = None
+            if "AIDE found" in verdict:
+                report = {"status": "alert", "last_check": day, "changes": []}
+            elif "AIDE check passed" in verdict or "Initializing" in verdict:
+                report = {"status": "ok", "last_check": day, "changes": []}
+        elif line.endswith(":") and not line.startswith(" "):
+            section = AIDE_SECTIONS.get(line)
+        elif m := AIDE_ENTRY_RE.match(line):
+            kind = AIDE_KINDS.get(m.group(1)) or section
+            if kind:
+                report["changes"].append(f"{kind} {m.group(2)}")
+    return report, section
 
-def get_aide_status(host):
-    """Get AIDE log summary."""
-    out, err = run_remote(host, ["tail", "-n", "50", "/var/log/aide/aide.log"])
-    if err or not out.strip():
-        return {"status": "unknown", "last_check": "never", "changes": []}
+def parse_uptime(out, err):
+    return out.strip() if not err else "unknown"
 
-    lines = out.strip().splitlines()
-    last_check = "unknown"
-    changes = []
-    status = "ok"
+PROBE_PARSERS = {
+    "failed_logins":  parse_failed_logins,
+    "config_changes": parse_config_changes,
+    "audit_summary":  parse_audit_summary,
+    "aide":           parse_aide_log,
+    "uptime":         parse_uptime,
+    "sudo":           parse_sudo,
+}
 
-    for line in lines:
-        if "AIDE check passed" in line or "no unexpected changes" in line:
-            last_check = line[:10] if len(line) > 10 else "recent"
-            status = "ok"
-        elif "AIDE found" in line:
-            m = re.search(r'found (\d+) change', line)
-            count = int(m.group(1)) if m else 1
-            last_check = line[:10] if len(line) > 10 else "recent"
-            status = "alert" if count > 0 else "ok"
-        elif re.match(r'^[A-Z] /', line):
-            changes.append(line.strip())
+def run_probe(host, name):
+    """Run a single probe over its own connection and parse the result."""
+    out, err = run_remote(host, probe_command(host, name), probe=name)
+    return PROBE_PARSERS[name](out, err)
 
-    return {
-        "status":     status,
-        "last_check": last_check,
-        "changes":    changes[:10],
+# ── Incremental audit window ───────────────────────────────────────────────────
+
+def audit_event_time(event):
+    """Timestamp of a failed-login dict or a config-change line, or None."""
+    text = event["time"] if isinstance(event, dict) else " ".join(event.split()[:2])
+    try:
+        return datetime.strptime(text, AUDIT_TIME_FORMAT)
+    except ValueError:
+        return None
+
+def audit_hours(rows):
+    """Count failed-login dicts or config-change lines per AUDIT_HOUR_FORMAT hour."""
+    hours = defaultdict(int)
+    for row in rows:
+        ts = audit_event_time(row)
+        if ts is not None:
+            hours[ts.strftime(AUDIT_HOUR_FORMAT)] += 1
+    return dict(hours)
+
+def audit_rows(probe, rows, hours=None):
+    """A windowed probe result: the newest AUDIT_ROWS rows plus events per hour."""
+    if not hours:
+        hours = audit_hours(rows)
+    return {"rows": rows[-AUDIT_ROWS[probe]:], "hours": hours}
+
+def audit_event_key(event):
+    if isinstance(event, dict):
+        return f'{event.get("event", "")} {event["time"]} {event["user"]} {event["host"]}'
+    return event
+
+def audit_since(window, now):
+    """--start for a probe: its checkpoint within the window, rounded down to the hour."""
+    start = now - timedelta(hours=AUDIT_WINDOW_HOURS)
+    checkpoint = window.get("checkpoint")
+    if checkpoint:
+        try:
+            start = max(start, datetime.strptime(checkpoint, AUDIT_TIME_FORMAT))
+        except ValueError:
+            pass
+    return start.replace(minute=0, second=0).strftime(AUDIT_TIME_FORMAT)
+
+def merge_audit_window(window, new, now, keep):
+    """Merge an audit_rows result into a probe's rolling window (in place) and return it."""
+    cutoff = now - timedelta(hours=AUDIT_WINDOW_HOURS)
+    merged = {}
+    for event in window.get("events", []):
+        ts = audit_event_time(event)
+        if ts is not None and ts >= cutoff:
+            merged[audit_event_key(event)] = event
+    for event in new["rows"]:
+        merged[audit_event_key(event)] = event
+    events = sorted(merged.values(), key=lambda e: audit_event_time(e) or now)[-keep:]
+
+    hours = window.get("hours", {})
+    first_hour = cutoff.replace(minute=0, second=0, microsecond=0)
+    hours = {
+        hour: count for hour, count in hours.items()
+        if datetime.strptime(hour, AUDIT_HOUR_FORMAT) >= first_hour
     }
+    hours.update(new["hours"])
 
-def get_host_uptime(host):
-    """Get host uptime."""
-    out, err = run_remote(host, ["uptime", "-p"])
-    return out.strip() if not err else "unknown"
+    window["events"] = events
+    window["hours"] = hours
+    window["checkpoint"] = (
+        now - timedelta(seconds=AUDIT_CHECKPOINT_OVERLAP)
+    ).strftime(AUDIT_TIME_FORMAT)
+    return {"rows": events, "hours": hours}
+
+def update_aide(log, read, err):
+    """Fold a parse_aide_log read into a host's AIDE log state (in place). Returns the report."""
+    if err:
+        return dict(AIDE_UNKNOWN)
+    report, section = fold_aide_log(
+        log.get("report") or AIDE_UNKNOWN, log.get("section"), read["text"]
+    )
+    log.update(inode=read["inode"], offset=read["end"], report=report, section=section)
+    return report
+
+def collect_probes(host, names=None):
+    """Run probes for a host (natively, batched or pooled) and return {probe name: parsed result}."""
+    names = list(PROBE_COMMANDS) if names is None else names
+    native = {}
+    wanted = [n for n in names if n in AUDIT_NATIVE_PROBES]
+    if host["local"] and NATIVE_AUDIT_PARSER and wanted:
+        try:
+            paths = audit_log_files()
+            if paths:
+                started = time.monotonic()
+                native = parse_audit_logs(paths, host.get("audit_since"),
+                                          names=wanted, index=host.get("audit_index"))
+                record_call(host["name"], "native_audit", started,
+                            sum(p.stat().st_size for p in paths), 0, False, None)
+        except OSError as e:
+            print(f"Native audit parsing failed, falling back to aureport: {e}")
+        names = [n for n in names if n not in native]
+    if not names:
+        return native
+    if BATCH_PROBES:
+        raw = run_batch(host, names)
+        return {**native, **{name: PROBE_PARSERS[name](*raw[name]) for name in names}}
+
+    with ThreadPoolExecutor(max_workers=PER_HOST_PROBES) as pool:
+        futures = {name: pool.submit(run_probe, host, name) for name in names}
+    return {**native, **{name: f.result() for name, f in futures.items()}}
 
-def collect_host_data(host):
-    """Collect all data for a single host."""
+def collect_host_data(host, deadline=None, audit=None, probes=None, results=None):
+    """Collect `probes` for a host by `deadline`, incrementally from `audit` and merged into `results`."""
     name = host["name"]
-    print(f"Collecting data from {name}...")
+    now = datetime.now()
+    probes = list(PROBE_COMMANDS) if probes is None else probes
+    results = {} if results is None else results
+    host = {**host, "deadline": deadline, "audit_since": {}}
+    if audit is not None:
+        host["audit_since"] = {
+            probe: audit_since(audit.get(probe, {}), now)
+            for probe in (*INCREMENTAL_PROBES, "sudo") if probe in probes
+        }
+    else:
+        # The sudo panel covers the last 24h rather than since midnight yesterday
+        host["audit_since"]["sudo"] = audit_since({}, now)
+    aide_log = audit.setdefault("aide", {}) if audit is not None else {}
+    host["aide_from"] = (aide_log.get("inode"), aide_log.get("offset", 0))
+    if audit is not None:
+        host["audit_index"] = audit.setdefault("native", {})
+    print(f"Collecting {', '.join(probes)} from {name}...")
+
+    fresh = collect_probes(host, probes)
+    # No probe answering means no host answering, whatever the errors say
+    down = all(probe_failed(probe, r) for probe, r in fresh.items())
+    if audit is not None:
+        for probe in INCREMENTAL_PROBES:
+            new, err = fresh.get(probe, (None, True))
+            if not err:
+                window = audit.setdefault(probe, {})
+                fresh[probe] = (merge_audit_window(window, new, now, AUDIT_ROWS[probe]), None)
+    if "sudo" in fresh:
+        tally, err = fresh["sudo"]
+        window = audit.setdefault("sudo", {}) if audit is not None and not err else {}
+        fresh["sudo"] = (merge_privilege_window(window, tally, now), err)
+    if "aide" in fresh:
+        fresh["aide"] = update_aide(aide_log, *fresh["aide"])
+    results.update(fresh)
 
-    failed_logins, fl_err = get_failed_logins(host)
-    config_changes, cc_err = get_config_changes(host)
-    audit_summary, as_err = get_audit_summary(host)
-    aide = get_aide_status(host)
-    uptime = get_host_uptime(host)
+    def result(probe):
+        return results.get(probe) or PROBE_PARSERS[probe]("", "pending")
 
-    reachable = fl_err != "timeout" and as_err != "timeout"
+    failed_logins, fl_err = result("failed_logins")
+    config_changes, cc_err = result("config_changes")
+    audit_summary, as_err = result("audit_summary")
+    aide = results.get("aide") or dict(AIDE_UNKNOWN)
+    uptime = result("uptime")
+    sudo, sudo_err = results.get("sudo") or (summarise_privilege(new_privilege()), "pending")
+
+    reachable = not down and not any(
+        err == "timeout" or str(err).startswith(SSH_UNREACHABLE)
+        for err in (fl_err, cc_err, as_err, sudo_err)
+    )
 
     return {
         "name":           name,
         "ip":             host["ip"],
         "reachable":      reachable,
+        "tags":           host.get("tags", []),
+        "collected_at":   time.time(),
         "uptime":         uptime,
-        "failed_logins":  failed_logins,
-        "config_changes": config_changes,
+        "failed_logins":  failed_logins["rows"],
+        "config_changes": config_changes["rows"],
+        "event_counts": {
+            "failed_logins":  sum(failed_logins["hours"].values()),
+            "config_changes": sum(config_changes["hours"].values()),
+        },
         "audit_summary":  audit_summary,
         "aide":           aide,
+        "sudo":           sudo,
         "errors": {
             "logins":  fl_err,
             "config":  cc_err,
             "summary": as_err,
+            "sudo":    sudo_err,
+        },
+    }
+
+def event_count(data, probe):
+    """Events in a windowed probe's window."""
+    return data["event_counts"][probe]
+
+def placeholder_host(host, reason="deadline"):
+    """Empty, unreachable host data: `reason` is "deadline" or "pending"."""
+    return {
+        "name":           host["name"],
+        "ip":             host["ip"],
+        "reachable":      False,
+        "tags":           host.get("tags", []),
+        "uptime":         "unknown",
+        "failed_logins":  [],
+        "config_changes": [],
+        "event_counts":   {"failed_logins": 0, "config_changes": 0},
+        "audit_summary":  {},
+        "aide":           dict(AIDE_UNKNOWN),
+        "sudo":           summarise_privilege(new_privilege()),
+        "errors": {
+            "logins":  reason,
+            "config":  reason,
+            "summary": reason,
+            "sudo":    reason,
         },
     }
 
+def collect_all(hosts, state=None, workers=COLLECT_WORKERS, run_deadline=RUN_DEADLINE):
+    """Collect every host concurrently; hosts past the run deadline come back as placeholders."""
+    deadline = time.monotonic() + run_deadline
+    # Workers get private copies of their audit state; only hosts that finish
+    # in time have theirs written back, so stragglers can't race save_state.
+    audit = state.setdefault("audit", {}) if state is not None else None
+    windows = {
+        host["name"]: copy.deepcopy(audit.get(host["name"], {}))
+        for host in hosts
+    } if audit is not None else {}
+    pool = ThreadPoolExecutor(max_workers=max(1, workers))
+    futures = [
+        pool.submit(collect_host_data, host, deadline, windows.get(host["name"]))
+        for host in hosts
+    ]
+    wait(futures, timeout=run_deadline)
+    pool.shutdown(wait=False, cancel_futures=True)
+
+    host_data = []
+    for host, future in zip(hosts, futures):
+        if future.done() and not future.cancelled() and future.exception() is None:
+            host_data.append(future.result())
+            if audit is not None:
+                audit[host["name"]] = windows[host["name"]]
+        else:
+            if future.done() and not future.cancelled():
+                print(f"Collection failed for {host['name']}: {future.exception()}")
+            else:
+                print(f"Deadline hit before {host['name']} finished")
+            host_data.append(placeholder_host(host))
+    return host_data
+
+def collect_with_cache(hosts, state=None, cache=None, poll=None):
+    """collect_all for the hosts due in `poll`, falling back to `cache` and state["last_failed"]."""
+    cache = {} if cache is None else cache
+    now = time.time()
+
+    def age(name):
+        return now - cache[name].get("collected_at", 0) if name in cache else None
+
+    pushed = {h["name"]: r for h in hosts if (r := load_report(h)) is not None}
+    poll = [
+        h for h in (hosts if poll is None else poll)
+        if h["name"] not in pushed
+        and (age(h["name"]) is None or age(h["name"]) >= HOST_CACHE_TTL)
+    ]
+    collected = {d["name"]: d for d in collect_all(poll, state)} if poll else {}
+    failed = state.setdefault("last_failed", {}) if state is not None else {}
+    if state is not None:
+        polled = state.setdefault("last_polled", {})
+        for name, data in collected.items():
+            if data["errors"].get("logins") != "deadline":
+                polled[name] = now
+    for name in set(failed) - {h["name"] for h in hosts}:
+        del failed[name]
+    for name, data in collected.items():
+        if data["reachable"]:
+            failed.pop(name, None)
+        else:
+            failed[name] = {"at": now, "errors": data["errors"]}
+
+    host_data = []
+    for host in hosts:
+        name = host["name"]
+        data = collected.get(name)
+        if name in pushed:
+            host_data.append(cached_fallback(pushed[name], cache))
+        elif data is None and name in failed:
+            host_data.append(cached_fallback(
+                {**placeholder_host(host), "errors": failed[name]["errors"]}, cache
+            ))
+        elif data is None and name in cache and age(name) < HOST_CACHE_MAX_STALE:
+            print(f"Using cached data for {name} ({int(age(name))}s old)")
+            host_data.append({**cache[name], "cached": True})
+        elif data is None:
+            host_data.append(placeholder_host(host, "pending"))
+        else:
+            host_data.append(cached_fallback(data, cache))
+    return host_data
+
+def cached_fallback(data, cache):
+    """Store a good result in `cache`, or stand in the cached one for a failure."""
+    name = data["name"]
+    if data["reachable"]:
+        cache[name] = data
+        return data
+    if name in cache:
+        age = time.time() - cache[name].get("collected_at", 0)
+        if age < HOST_CACHE_MAX_STALE:
+            print(f"{name} failed — showing last known data ({int(age)}s old)")
+            return {**cache[name], "reachable": False, "stale": True,
+                    "errors": data["errors"]}
+    return data
+
+# ── Metrics history ────────────────────────────────────────────────────────────
+
+METRICS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS metrics_raw (
+    ts     INTEGER NOT NULL,
+    host   TEXT    NOT NULL,
+    metric TEXT    NOT NULL,
+    value  REAL    NOT NULL
+);
+CREATE INDEX IF NOT EXISTS metrics_raw_ts      ON metrics_raw (ts);
+CREATE INDEX IF NOT EXISTS metrics_raw_host_ts ON metrics_raw (host, ts);
+CREATE TABLE IF NOT EXISTS metrics_hourly (
+    bucket INTEGER NOT NULL,
+    host   TEXT    NOT NULL,
+    metric TEXT    NOT NULL,
+    min    REAL    NOT NULL,
+    max    REAL    NOT NULL,
+    sum    REAL    NOT NULL,
+    count  INTEGER NOT NULL,
+    PRIMARY KEY (host, metric, bucket)
+) WITHOUT ROWID;
+"""
+
+def open_metrics(path=None):
+    db = sqlite3.connect(path or METRICS_DB)
+    db.executescript(METRICS_SCHEMA)
+    return db
+
+def host_metrics(data):
+    """Flatten one host's collected data into {metric: value}."""
+    metrics = {
+        "failed_logins":  event_count(data, "failed_logins"),
+        "config_changes": event_count(data, "config_changes"),
+        "aide_alert":     1 if data["aide"].get("status") == "alert" else 0,
+    }
+    if "sudo" in data:
+        metrics["sudo_commands"] = data["sudo"]["total"]
+        metrics["sudo_failed"]   = data["sudo"]["failed"]
+    for key, value in data["audit_summary"].items():
+        metrics["summary:" + key] = value
+    return metrics
+
+def record_metrics(db, host_data, now=None):
+    """Append this run's fresh per-host metrics once each and roll them into hourly buckets."""
+    now = int(now or time.time())
+    rows = []
+    for data in host_data:
+        if not data["reachable"] or data.get("cached") or data.get("stale"):
+            continue
+        ts = now
+        if data.get("pushed"):
+            ts = int(data.get("sent_at") or data["collected_at"])
+            if db.execute(
+                "SELECT 1 FROM metrics_raw WHERE host = ? AND ts = ? LIMIT 1", (data["name"], ts)
+            ).fetchone():
+                continue
+        rows.extend((ts, data["name"], metric, value) for metric, value in host_metrics(data).items())
+    with db:
+        db.executemany("INSERT INTO metrics_raw (ts, host, metric, value) VALUES (?, ?, ?, ?)", rows)
+        db.executemany(
+            """INSERT INTO metrics_hourly (bucket, host, metric, min, max, sum, count)
+               VALUES (?, ?, ?, ?, ?, ?, 1)
+               ON CONFLICT (host, metric, bucket) DO UPDATE SET
+                   min   = min(min, excluded.min),
+                   max   = max(max, excluded.max),
+                   sum   = sum + excluded.sum,
+                   count = count + 1""",
+            [(ts - ts % 3600, host, metric, value, value, value) for ts, host, metric, value in rows],
+        )
+        db.execute("DELETE FROM metrics_raw WHERE ts < ?", (now - METRICS_RAW_DAYS * 86400,))
+        db.execute("DELETE FROM metrics_hourly WHERE bucket < ?", (now - METRICS_HOURLY_DAYS * 86400,))
+
+def metric_trends(db, metrics=TREND_METRICS, now=None):
+    """Per-host {metric: {"7d": hourly, "30d": daily}} maxima from the hourly table, oldest first."""
+    now = int(now or time.time())
+    trends = defaultdict(lambda: defaultdict(dict))
+    marks = ",".join("?" * len(metrics))
+    for window, slots, width in (("7d", 168, 3600), ("30d", 30, 86400)):
+        start = now - now % width - (slots - 1) * width
+        series = defaultdict(lambda: [None] * slots)
+        for host, metric, slot, value in db.execute(
+            f"""SELECT host, metric, (bucket - ?) / ?, max(max) FROM metrics_hourly
+                WHERE bucket >= ? AND metric IN ({marks})
+                GROUP BY host, metric, (bucket - ?) / ?""",
+            (start, width, start, *metrics, start, width),
+        ):
+            series[(host, metric)][slot] = value
+        for (host, metric), values in series.items():
+            trends[host][metric][window] = values
+    return trends
+
+def update_history(host_data):
+    """Record this run in METRICS_DB and return trends for render_html."""
+    try:
+        db = open_metrics()
+        try:
+            record_metrics(db, host_data)
+            return metric_trends(db)
+        finally:
+            db.close()
+    except Exception as e:
+        print(f"Warning: could not update metrics history: {e}")
+        return {}
+
+# ── Push ingestion ─────────────────────────────────────────────────────────────
+
+def load_ingest_key(path=None):
+    try:
+        return Path(path or INGEST_KEY_FILE).read_bytes().strip() or None
+    except OSError:
+        return None
+
+def sign_report(key, body):
+    return "sha256=" + hmac.new(key, body, hashlib.sha256).hexdigest()
+
+def verify_report(key, body, signature, hosts, now=None, reports_dir=None):
+    """Authenticate and unpack a pushed report. Returns (host, data, sent_at); raises ValueError."""
+    if not signature or not hmac.compare_digest(sign_report(key, body), signature):
+        raise ValueError("bad signature")
+    report = json.loads(body)
+    if not isinstance(report, dict):
+        raise ValueError("malformed report")
+    name = report.get("host")
+    if not isinstance(name, str) or name not in {h["name"] for h in hosts}:
+        raise ValueError(f"unknown host {name!r}")
+    try:
+        sent_at = float(report.get("sent_at", 0))
+    except (TypeError, ValueError):
+        raise ValueError("malformed report")
+    if abs((now or time.time()) - sent_at) > REPORT_MAX_SKEW:
+        raise ValueError("report too old")
+    if sent_at <= last_sent_at(name, reports_dir):
+        raise ValueError("replayed report")
+    data = report.get("data")
+    if not valid_report_data(data):
+        raise ValueError("malformed report")
+    return name, data, sent_at
+
+def valid_report_data(data):
+    """Whether pushed data has every field rendering reads, with the right types."""
+    if not isinstance(data, dict):
+        return False
+    if any(not isinstance(data.get(k), t) for k, t in REPORT_FIELDS.items()):
+        return False
+    if any(k in data and not isinstance(data[k], t) for k, t in REPORT_OPTIONAL.items()):
+        return False
+    if any(not isinstance(data["event_counts"].get(probe), int) for probe in AUDIT_ROWS):
+        return False
+    return "sudo" not in data or all(k in data["sudo"] for k in summarise_privilege(new_privilege()))
+
+def store_report(name, data, sent_at, reports_dir=None):
+    reports_dir = Path(reports_dir or REPORTS_DIR)
+    reports_dir.mkdir(parents=True, exist_ok=True)
+    tmp = reports_dir / f".{name}.json.tmp"
+    tmp.write_text(json.dumps({"received_at": time.time(), "sent_at": sent_at, "data": data}))
+    tmp.replace(reports_dir / f"{name}.json")
+
+def last_sent_at(name, reports_dir=None):
+    """Send time of the last report accepted from `name`, or 0."""
+    try:
+        report = json.loads((Path(reports_dir or REPORTS_DIR) / f"{name}.json").read_text())
+        return float(report.get("sent_at") or 0)
+    except Exception:
+        return 0
+
+def load_report(host, reports_dir=None, now=None):
+    """Host data from a pushed report younger than REPORT_MAX_AGE, or None."""
+    try:
+        report = json.loads((Path(reports_dir or REPORTS_DIR) / f"{host['name']}.json").read_text())
+    except Exception:
+        return None
+    received_at = report.get("received_at", 0)
+    if (now or time.time()) - received_at >= REPORT_MAX_AGE:
+        return None
+    return {
+        **report["data"],
+        "name":         host["name"],
+        "ip":           host["ip"],
+        "tags":         list(dict.fromkeys([*host.get("tags", []), *report["data"].get("tags", [])])),
+        "reachable":    True,
+        "pushed":       True,
+        "collected_at": received_at,
+        "sent_at":      report.get("sent_at"),
+        "errors":       report["data"].get("errors", {}),
+    }
+
+def make_ingest_handler(key, hosts, reports_dir=None):
+    accept = Lock()   # check-then-store, so two copies of a report can't both pass
+
+    class IngestHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != "/report":
+                self.send_error(404)
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            if length <= 0 or length > REPORT_MAX_BYTES:
+                self.send_error(413)
+                return
+            body = self.rfile.read(length)
+            with accept:
+                try:
+                    name, data, sent_at = verify_report(
+                        key, body, self.headers.get("X-Report-Signature"), hosts,
+                        reports_dir=reports_dir,
+                    )
+                except ValueError as e:
+                    print(f"Rejected report from {self.client_address[0]}: {e}")
+                    self.send_error(403)
+                    return
+                store_report(name, data, sent_at, reports_dir)
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, *a): pass
+
+    return IngestHandler
+
+def start_receiver(key, hosts=None, bind=INGEST_BIND, reports_dir=None):
+    """Serve POST /report in a background thread. Returns the server."""
+    server = ThreadingHTTPServer(bind, make_ingest_handler(key, hosts or load_inventory(), reports_dir))
+    Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Accepting pushed reports on {bind[0]}:{server.server_address[1]}")
+    return server
+
+def push_report(url, key, name=None):
+    """Agent side: run every probe locally and POST the report to `url`."""
+    name = name or socket.gethostname()
+    data = collect_host_data({"name": name, "ip": "localhost", "port": 22, "local": True})
+    body = json.dumps({"host": name, "sent_at": time.time(), "data": data}).encode()
+    req = urlrequest.Request(
+        url, data=body, method="POST",
+        headers={"Content-Type": "application/json", "X-Report-Signature": sign_report(key, body)},
+    )
+    with urlrequest.urlopen(req, timeout=15) as resp:
+        return resp.status
+
 # ── HTML generation ────────────────────────────────────────────────────────────
 
 def severity_color(count, warn=1, crit=5):
@@ -226,16 +1418,86 @@ def severity_color(count, warn=1, crit=5):
     else:
         return "var(--red)"
 
-def render_host_card(data):
+def format_age(seconds):
+    seconds = int(seconds)
+    if seconds < 3600:
+        return f"{seconds // 60}m"
+    if seconds < 86400:
+        return f"{seconds // 3600}h"
+    return f"{seconds // 86400}d"
+
+def sparkline(values, color="var(--blue)", width=120, height=24):
+    """Inline SVG polyline for a series; None values are left as gaps."""
+    points = [(i, v) for i, v in enumerate(values) if v is not None]
+    if not points:
+        return '<span style="color:var(--muted)">no data</span>'
+    top  = max(v for _, v in points) or 1
+    step = width / max(1, len(values) - 1)
+    segments, current, last = [], [], None
+    for i, v in points:
+        if last is not None and i != last + 1:
+            segments.append(current)
+            current = []
+        current.append(f"{i * step:.1f},{height - 2 - v / top * (height - 4):.1f}")
+        last = i
+    segments.append(current)
+    lines = "".join(
+        f'<polyline points="{" ".join(seg)}" fill="none" stroke="{color}" stroke-width="1.5"/>'
+        if len(seg) > 1 else
+        f'<circle cx="{seg[0].split(",")[0]}" cy="{seg[0].split(",")[1]}" r="1.5" fill="{color}"/>'
+        for seg in segments
+    )
+    return f'<svg width="{width}" height="{height}" viewBox="0 0 {width} {height}">{lines}</svg>'
+
+def render_trends(trend):
+    """Trend rows (7d hourly / 30d daily peaks) for the metrics in TREND_METRICS."""
+    labels = {"failed_logins": "Failed logins", "config_changes": "Config changes"}
+    rows = ""
+    for metric in TREND_METRICS:
+        series = trend.get(metric, {})
+        peak_7d  = max((v for v in series.get("7d", []) if v is not None), default=0)
+        peak_30d = max((v for v in series.get("30d", []) if v is not None), default=0)
+        rows += f'''
+          <tr>
+            <td>{labels.get(metric, metric)}</td>
+            <td>{sparkline(series.get("7d", []))} <span style="color:var(--muted)">{int(peak_7d)}</span></td>
+            <td>{sparkline(series.get("30d", []), "var(--purple)")} <span style="color:var(--muted)">{int(peak_30d)}</span></td>
+          </tr>'''
+    return f'''
+      <div style="margin-top:1rem">
+        <div class="section-label">Trends (peak per hour / per day)</div>
+        <table style="width:100%">
+          <tr><th>Metric</th><th>7 days</th><th>30 days</th></tr>
+          {rows}
+        </table>
+      </div>'''
+
+def render_host_card(data, trend=None):
     name      = data["name"]
     reachable = data["reachable"]
+    stale     = data.get("stale", False)
     uptime    = data["uptime"]
     logins    = data["failed_logins"]
     changes   = data["config_changes"]
     aide      = data["aide"]
     summary   = data["audit_summary"]
+    sudo      = data.get("sudo")
 
-    if not reachable:
+    age = format_age(time.time() - data.get("collected_at", time.time()))
+    if stale:
+        status_html = f'<span class="host-status" style="color:var(--yellow)">◌ stale · last seen {age} ago</span>'
+    elif data.get("pushed"):
+        status_html = f'<span class="host-status" style="color:var(--green)">● online · pushed {age} ago</span>'
+    elif data.get("cached"):
+        status_html = f'<span class="host-status" style="color:var(--green)">● online · cached {age} ago</span>'
+    else:
+        status_html = '<span class="host-status" style="color:var(--green)">● online</span>'
+
+    if not reachable and not stale:
+        reason = {
+            "deadline": "Collection did not finish before the run deadline",
+            "pending":  "Not polled yet — scheduled for a later run",
+        }.get(data["errors"].get("logins"), f'Could not connect to {data["ip"]}')
         return f'''
         <div class="host-card unreachable">
           <div class="host-header">
@@ -243,18 +1505,18 @@ def render_host_card(data):
             <span class="host-status" style="color:var(--red)">unreachable</span>
           </div>
           <p style="color:var(--muted);font-size:.875rem;margin-top:.5rem">
-            Could not connect to {data["ip"]}
+            {reason}
           </p>
         </div>'''
 
-    login_count  = len(logins)
-    change_count = len(changes)
+    login_count  = event_count(data, "failed_logins")
+    change_count = event_count(data, "config_changes")
     aide_status  = aide.get("status", "unknown")
     aide_color   = "var(--green)" if aide_status == "ok" else (
                    "var(--red)" if aide_status == "alert" else "var(--muted)")
 
     login_rows = ""
-    for l in logins[:5]:
+    for l in logins[-AUDIT_ROWS["failed_logins"]:]:
         login_rows += f'''
         <tr>
           <td>{l.get("time","")}</td>
@@ -263,17 +1525,39 @@ def render_host_card(data):
           <td style="color:var(--red)">{l.get("result","failed")}</td>
         </tr>'''
 
+    sudo_html = ""
+    if sudo and (sudo["total"] or sudo["failed"]):
+        def top(pairs):
+            return ", ".join(f"<code>{escape(k)}</code> {n}" for k, n in pairs)
+        command_rows = "".join(
+            f'<tr><td><code>{escape(cmd)}</code></td><td>{n}</td></tr>'
+            for cmd, n in sudo["by_command"]
+        )
+        sudo_html = f"""
+      <div style="margin-top:1rem">
+        <div class="section-label">Privilege escalation (24h)</div>
+        <div style="font-size:.8rem;margin-bottom:.5rem">
+          {sudo["total"]} commands ·
+          <span style="color:{severity_color(sudo["failed"])}">{sudo["failed"]} failed auths</span>
+        </div>
+        <div style="color:var(--muted);font-size:.75rem">By user: {top(sudo["by_user"])}</div>
+        <div style="color:var(--muted);font-size:.75rem;margin-bottom:.5rem">As: {top(sudo["by_target"])}</div>
+        {f'<table><tr><th>Command</th><th>Runs</th></tr>{command_rows}</table>' if command_rows else ""}
+      </div>"""
+
     aide_changes = ""
-    for c in aide.get("changes", []):
-        aide_changes += f'<div style="color:var(--yellow);font-size:.8rem;font-family:monospace">{c}</div>'
+    for c in aide.get("changes", [])[:AIDE_SHOWN_CHANGES]:
+        aide_changes += f'<div style="color:var(--yellow);font-size:.8rem;font-family:monospace">{escape(c)}</div>'
+    if len(aide.get("changes", [])) > AIDE_SHOWN_CHANGES:
+        aide_changes += f'<div style="color:var(--muted);font-size:.75rem">… and {len(aide["changes"]) - AIDE_SHOWN_CHANGES} more</div>'
 
     return f'''
-    <div class="host-card">
+    <div class="host-card{" stale" if stale else ""}">
       <div class="host-header">
         <span class="host-name">🖥 {name}</span>
-        <span class="host-status" style="color:var(--green)">● online</span>
+        {status_html}
       </div>
-      <div style="color:var(--muted);font-size:.75rem;margin-bottom:1rem">{uptime}</div>
+      <div style="color:var(--muted);font-size:.75rem;margin-bottom:1rem">{" · ".join([uptime, *data.get("tags", [])])}</div>
 
       <div class="metric-row">
         <div class="metric">
@@ -303,20 +1587,26 @@ def render_host_card(data):
 
       {f"""
       <div style="margin-top:1rem">
-        <div class="section-label">AIDE changes detected</div>
+        <div class="section-label">AIDE changes detected · {aide.get("last_check", "")}</div>
         {aide_changes}
       </div>""" if aide.get("changes") else ""}
+
+      {sudo_html}
+
+      {render_trends(trend) if trend else ""}
     </div>'''
 
-def render_html(host_data):
+def render_html(host_data, trends=None, refresh=900):
     now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    refresh_label = f"{refresh // 60} min" if refresh >= 60 else f"{refresh} s"
 
-    total_failed_logins = sum(len(h["failed_logins"]) for h in host_data)
+    total_failed_logins = sum(event_count(h, "failed_logins") for h in host_data)
     total_aide_alerts   = sum(1 for h in host_data if h["aide"]["status"] == "alert")
     unreachable         = sum(1 for h in host_data if not h["reachable"])
     total_hosts         = len(host_data)
 
-    host_cards = "\n".join(render_host_card(h) for h in host_data)
+    trends     = trends or {}
+    host_cards = "\n".join(render_host_card(h, trends.get(h["name"])) for h in host_data)
 
     overall_status = "NORMAL"
     status_color   = "var(--green)"
@@ -332,7 +1622,7 @@ def render_html(host_data):
 <head>
 <meta charset="UTF-8">
 <meta name="viewport" content="width=device-width,initial-scale=1">
-<meta http-equiv="refresh" content="900">
+<meta http-equiv="refresh" content="{refresh}">
 <title>constellation — security dashboard</title>
 <style>
 :root{{
@@ -352,6 +1642,7 @@ h1{{color:var(--blue);font-size:1.5rem;margin-bottom:.25rem}}
 .host-grid{{display:grid;grid-template-columns:repeat(auto-fit,minmax(400px,1fr));gap:1.5rem}}
 .host-card{{background:var(--bg2);border:1px solid var(--border);border-radius:8px;padding:1.5rem}}
 .host-card.unreachable{{border-color:var(--red);opacity:.7}}
+.host-card.stale{{border-color:var(--yellow);border-style:dashed;opacity:.8}}
 .host-header{{display:flex;justify-content:space-between;align-items:center;margin-bottom:.25rem}}
 .host-name{{font-weight:700;font-size:1rem}}
 .host-status{{font-size:.8rem}}
@@ -370,7 +1661,7 @@ code{{color:var(--blue);background:var(--bg3);padding:.1em .3em;border-radius:3p
 </head>
 <body>
 <h1>🔐 constellation — security dashboard</h1>
-<p class="subtitle">Updated: {now} · Auto-refreshes every 15 min · {total_hosts} hosts monitored</p>
+<p class="subtitle">Updated: {now} · Auto-refreshes every {refresh_label} · {total_hosts} hosts monitored</p>
 
 <div class="status-banner">
   <span style="font-size:1.5rem">{"✓" if overall_status == "NORMAL" else "⚠"}</span>
@@ -411,21 +1702,149 @@ code{{color:var(--blue);background:var(--bg3);padding:.1em .3em;border-radius:3p
 </body>
 </html>"""
 
+# ── Daemon mode ────────────────────────────────────────────────────────────────
+
+def write_dashboard(host_data, trends, refresh=900):
+    OUTPUT_FILE.write_text(render_html(host_data, trends, refresh))
+
+    reachable = sum(1 for h in host_data if h["reachable"])
+    alerts    = sum(1 for h in host_data if h["aide"]["status"] == "alert")
+    logins    = sum(event_count(h, "failed_logins") for h in host_data)
+    print(f"Dashboard written — {reachable}/{len(host_data)} hosts, {logins} failed logins, {alerts} AIDE alerts")
+
+def probe_interval(host, probe):
+    """Daemon cadence for a probe; a host's inventory interval is a lower bound."""
+    return max(PROBE_INTERVALS[probe], host.get("interval") or 0)
+
+def dashboard_inputs(host_data):
+    """Stable fingerprint of what the page shows, ignoring collection times."""
+    return json.dumps(
+        [{k: v for k, v in h.items() if k != "collected_at"} for h in host_data],
+        sort_keys=True, default=str,
+    )
+
+def run_daemon(hosts=None):
+    """Resident collector: each probe runs on its own PROBE_INTERVALS cadence."""
+    hosts = hosts or load_inventory()
+    key = load_ingest_key()
+    if key:
+        start_receiver(key, hosts)
+
+    state = load_state()
+    cache = load_cache()
+    audit = state.setdefault("audit", {})
+    results  = {host["name"]: {} for host in hosts}
+    last_run = {}
+    latest   = {}
+    rendered = None
+    trends   = {}
+    last_sample = float("-inf")
+
+    with ThreadPoolExecutor(max_workers=max(1, COLLECT_WORKERS)) as pool:
+        while True:
+            tick = time.monotonic()
+            start_trace()
+            jobs = {}
+            for host in hosts:
+                name = host["name"]
+                report = load_report(host)
+                if report is not None:
+                    latest[name] = report
+                    continue
+                due = [
+                    probe for probe in PROBE_COMMANDS
+                    if tick - last_run.get((name, probe), float("-inf")) >= probe_interval(host, probe)
+                ]
+                if not due:
+                    continue
+                for probe in due:
+                    last_run[(name, probe)] = tick
+                jobs[name] = pool.submit(
+                    collect_host_data, host, tick + RUN_DEADLINE,
+                    audit.setdefault(name, {}), due, results[name],
+                )
+
+            for name, job in jobs.items():
+                try:
+                    latest[name] = job.result()
+                except Exception as e:
+                    print(f"Collection failed for {name}: {e}")
+
+            if jobs or latest:
+                save_state(state)
+                host_data = [
+                    cached_fallback(latest[h["name"]], cache)
+                    for h in hosts if h["name"] in latest
+                ]
+                save_cache(cache)
+                if jobs:
+                    write_trace(host_data)
+
+                sampled = tick - last_sample >= DAEMON_METRICS_INTERVAL
+                if sampled:
+                    trends = update_history(host_data)
+                    last_sample = tick
+
+                inputs = dashboard_inputs(host_data)
+                if sampled or inputs != rendered:
+                    write_dashboard(host_data, trends, DAEMON_REFRESH)
+                    rendered = inputs
+
+            next_due = min(
+                last_run.get((h["name"], probe), tick) + probe_interval(h, probe)
+                for h in hosts for probe in PROBE_COMMANDS
+            )
+            time.sleep(max(1.0, next_due - time.monotonic()))
+
 # ── Main ───────────────────────────────────────────────────────────────────────
 
 if __name__ == "__main__":
-    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    parser = argparse.ArgumentParser(description="Generate the security dashboard.")
+    parser.add_argument(
+        "--daemon", action="store_true",
+        help="stay resident and run each probe on its own schedule (PROBE_INTERVALS)",
+    )
+    parser.add_argument(
+        "--receive", action="store_true",
+        help="only accept pushed host reports (for timer mode)",
+    )
+    parser.add_argument(
+        "--agent", metavar="URL",
+        help="run the probes on this host and push the report to URL instead",
+    )
+    parser.add_argument("--name", help="host name to report as (default: hostname)")
+    parser.add_argument("--key-file", help=f"shared ingest key (default: {INGEST_KEY_FILE})")
+    args = parser.parse_args()
 
-    host_data = []
-    for host in HOSTS:
-        data = collect_host_data(host)
-        host_data.append(data)
+    if args.agent:
+        key = load_ingest_key(args.key_file)
+        if not key:
+            raise SystemExit(f"No ingest key at {args.key_file or INGEST_KEY_FILE}")
+        status = push_report(args.agent, key, args.name)
+        print(f"Report pushed to {args.agent} ({status})")
+        raise SystemExit(0)
 
-    html = render_html(host_data)
-    OUTPUT_FILE.write_text(html)
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    if SSH_CONTROL_PERSIST:
+        SSH_CONTROL_DIR.mkdir(mode=0o700, exist_ok=True)
 
-    reachable = sum(1 for h in host_data if h["reachable"])
-    alerts    = sum(1 for h in host_data if h["aide"]["status"] == "alert")
-    logins    = sum(len(h["failed_logins"]) for h in host_data)
-    print(f"Dashboard written — {reachable}/{len(HOSTS)} hosts, {logins} failed logins, {alerts} AIDE alerts")
+    if args.receive:
+        key = load_ingest_key(args.key_file)
+        if not key:
+            raise SystemExit(f"No ingest key at {args.key_file or INGEST_KEY_FILE}")
+        print(f"Accepting pushed reports on {INGEST_BIND[0]}:{INGEST_BIND[1]}")
+        ThreadingHTTPServer(INGEST_BIND, make_ingest_handler(key, load_inventory())).serve_forever()
+    elif args.daemon:
+        run_daemon()
+    else:
+        state = load_state()
+        cache = load_cache()
+        start_trace()
+        hosts = load_inventory()
+        host_data = collect_with_cache(hosts, state, cache, schedule_hosts(hosts, state))
+        save_state(state)
+        save_cache(cache)
+        write_trace(host_data)
 
+        trends = update_history(host_data)
+        write_dashboard(host_data, trends)
@@ -1,20 +1,40 @@
 # hosts/eridanus/security-dashboard.nix
 #
 # Security monitoring dashboard — aggregates auditd + aide data from all hosts.
-# Runs every 15 minutes via systemd timer.
+# Runs as a resident daemon (or every 15 minutes via systemd timer, see daemonMode).
 # Served by nginx on security.lan (internal only, WireGuard accessible).
-{ config, pkgs, ... }:
+{ config, pkgs, lib, ... }:
 let
   # Hosts to monitor — must be reachable via SSH from eridanus
   # eridanus monitors itself locally (no SSH needed)
+  # Optional per host: sshPort, tags, priority ("critical" = polled every run),
+  # interval (seconds between polls, spread across runs), enable.
   monitoredHosts = [
-    { name = "orion";       ip = "10.40.10.1";   }
-    { name = "caelum";      ip = "10.40.40.101";  }
-    { name = "andromeda";   ip = "10.40.40.104";  }
-    { name = "horologium";  ip = "10.40.40.106";  }
-    { name = "lyra";        ip = "77.42.83.12";   sshPort = 22022; }
+    { name = "orion";       ip = "10.40.10.1";    tags = [ "router" ]; priority = "critical"; }
+    { name = "caelum";      ip = "10.40.40.101";  tags = [ "server" ]; }
+    { name = "andromeda";   ip = "10.40.40.104";  tags = [ "server" ]; }
+    { name = "horologium";  ip = "10.40.40.106";  tags = [ "server" ]; }
+    # Root SSH is disabled on lyra (PermitRootLogin = "no") — needs the push agent
+    { name = "lyra";        ip = "77.42.83.12";   sshPort = 22022; tags = [ "vps" ]; enable = false; }
   ];
 
+  # Written to /etc/security-dashboard/hosts.json, read by the script at startup
+  inventory = [
+    { name = "eridanus"; ip = "localhost"; port = 22; local = true;
+      tags = [ "server" ]; priority = "critical"; interval = null; }
+  ] ++ map (h: {
+    inherit (h) name ip;
+    port     = h.sshPort or 22;
+    local    = false;
+    tags     = h.tags or [ ];
+    priority = h.priority or "normal";
+    interval = h.interval or null;
+  }) (lib.filter (h: h.enable or true) monitoredHosts);
+
+  # Keep the collector resident (--daemon) with per-probe schedules instead of
+  # starting a fresh interpreter from the 15-minute timer.
+  daemonMode = true;
+
   dashboardScript = pkgs.writeScript "generate-security-dashboard" ''
     #!${pkgs.python3}/bin/python3
     ${builtins.readFile ./generate-security-dashboard.py}
@@ -26,30 +46,47 @@ in
   # The root user's SSH key must be in authorizedKeys on each host
   # Generate with: ssh-keygen -t ed25519 -f /persist/etc/ssh/monitor_key -N ""
   # Then add the public key to each host's authorizedKeys
+  #
+  # Hosts importing modules/nixos/optional/security-agent.nix push their own
+  # reports to :8091 instead. Shared key (same file on eridanus and agents):
+  # head -c 32 /dev/urandom | base64 > /persist/etc/security-dashboard/ingest.key
 
   # ── Dashboard generator ────────────────────────────────────────────────────
   systemd.services.security-dashboard = {
     description = "Generate security monitoring dashboard";
     after       = [ "network.target" ];
+    wantedBy    = lib.optional daemonMode "multi-user.target";
+    restartTriggers = [ config.environment.etc."security-dashboard/hosts.json".source ];
     path = with pkgs; [
       openssh        # for ssh commands to remote hosts
       audit          # for aureport/ausearch
       aide           # for local aide checks
+      bash           # sh for batched and aide/sudo probes
       coreutils
+      gawk           # audit row filter
       gnugrep
+      procps         # for uptime
     ];
-    serviceConfig = {
+    # Run as root to access audit logs
+    serviceConfig = if daemonMode then {
+      Type            = "simple";
+      ExecStart       = "${dashboardScript} --daemon";
+      Restart         = "always";
+      RestartSec      = "30s";
+    } else {
       Type            = "oneshot";
       ExecStart       = dashboardScript;
-      # Run as root to access audit logs
+      # Leave ssh ControlPersist masters running so the next run reuses them
+      KillMode        = "process";
     };
     environment = {
       HOME           = "/root";
+      PYTHONUNBUFFERED = "1";   # daemon output straight to the journal
       SSH_OPTIONS    = "-o StrictHostKeyChecking=no -o ConnectTimeout=5 -o BatchMode=yes";
     };
   };
 
-  systemd.timers.security-dashboard = {
+  systemd.timers.security-dashboard = lib.mkIf (!daemonMode) {
     description = "Regenerate security dashboard every 15 minutes";
     wantedBy    = [ "timers.target" ];
     timerConfig = {
@@ -59,22 +96,25 @@ in
     };
   };
 
+  environment.etc."security-dashboard/hosts.json".text = builtins.toJSON inventory;
+
   # ── nginx vhost ────────────────────────────────────────────────────────────
   # Accessible at http://security.lan or http://10.40.40.117:8090
   # Add security.lan to NSD lan. zone pointing to 10.40.40.117
   services.nginx.virtualHosts."security.lan" = {
     listen = [{ addr = "0.0.0.0"; port = 8090; }];
-    locations."/" = {
-      root = "/var/lib/security-dashboard";
-      tryFiles = "$uri $uri/ /index.html";
-      extraConfig = ''
-        add_header Cache-Control "no-cache, no-store, must-revalidate";
-      '';
-    };
+    root = "/var/lib/security-dashboard";
+    # Only the page itself: state, host cache, metrics, pushed reports, the
+    # trace and ssh-mux sockets all live in the same directory
+    locations."= /".tryFiles = "/index.html =404";
+    locations."= /index.html".extraConfig = ''
+      add_header Cache-Control "no-cache, no-store, must-revalidate";
+    '';
+    locations."/".return = "404";
   };
 
-  # Open port 8090 on trusted interfaces only
-  networking.firewall.interfaces.enp1s0.allowedTCPPorts = [ 8090 ];
+  # Open dashboard (8090) and report ingestion (8091) on trusted interfaces only
+  networking.firewall.interfaces.enp1s0.allowedTCPPorts = [ 8090 8091 ];
 
   # ── Dashboard directory ────────────────────────────────────────────────────
   systemd.tmpfiles.rules = [
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# hosts/lyra/bench-dashboard.py
+#
+# Benchmark harness for generate-dashboard.py.
+#
+# Writes a synthetic endlessh-go journal and honeypot logs (N lines in
+# total, spread over the last 23 hours across a configurable number of
+# source IPs), puts fake `journalctl` and `cscli` first on PATH, points the
+# dashboard at a scratch output directory and times each stage of a full
+# one-shot pass: reading the journal and logs, recording hits, listing
+# decisions, banning and rendering. A second pass with nothing new checks
+# that incremental reads stay cheap. Each size runs in its own interpreter
+# so peak RSS isn't inherited from the previous one.
+#
+#   ./bench-dashboard.py                                # 10k, 100k, 1M lines
+#   ./bench-dashboard.py --lines 10000000 --ips 200000 --decisions 20000
+#   ./bench-dashboard.py --save-baseline base.json
+#   ./bench-dashboard.py --compare base.json            # exit 1 on regression
+
+import argparse
+import importlib.util
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+DASHBOARD = Path(__file__).with_name("generate-dashboard.py")
+
+# ── Stand-ins ─────────────────────────────────────────────────────────────────
+# Plain sh + awk so a 10M-line journal isn't pushed through another Python.
+
+# Cursors are line numbers in $BENCH_JOURNAL; -f isn't supported
+FAKE_JOURNALCTL = r'''#!/bin/sh
+after=0
+while [ $# -gt 0 ]; do
+  case "$1" in
+    --after-cursor) after=$2; shift 2 ;;
+    *)              shift ;;
+  esac
+done
+exec awk -v after="$after" \
+  'NR > after { print } END { if (NR > after) print "-- cursor: " NR }' "$BENCH_JOURNAL"
+'''
+
+FAKE_CSCLI = r'''#!/bin/sh
+while [ $# -gt 0 ]; do
+  case "$1" in
+    list) exec cat "$BENCH_DIR/decisions.json" ;;
+    -i)   cp "$2" "$BENCH_DIR/imported.json"; shift 2 ;;
+    *)    shift ;;
+  esac
+done
+echo "Imported decisions"
+'''
+
+def install_fakes(bin_dir):
+    for name, body in (("journalctl", FAKE_JOURNALCTL), ("cscli", FAKE_CSCLI)):
+        path = bin_dir / name
+        path.write_text(body)
+        path.chmod(0o755)
+
+def bench_ip(n):
+    """Source address n; neighbours share a /24 so range bans get exercised."""
+    return f"198.{18 + (n >> 16) % 2}.{(n >> 8) & 255}.{n & 255}"
+
+def write_logs(tmp, lines, ips, honeypot_share, services):
+    """Synthetic journal and honeypot logs; returns their paths by name."""
+    now   = int(time.time())
+    start = now - 23 * 3600
+    paths = {"journal": tmp / "journal"}
+    logs  = tmp / "honeypot"
+    logs.mkdir()
+    for svc in services:
+        paths[svc] = logs / f"{svc}.log"
+    files = {name: open(path, "w") for name, path in paths.items()}
+    every = round(1 / honeypot_share) if honeypot_share else 0
+    stamp, last = "", None
+    try:
+        for i in range(lines):
+            t = start + i * (now - start) // lines
+            if t != last:
+                stamp, last = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(t)), t
+            ip = bench_ip(i * 7919 % ips)
+            if every and i % every == 0:
+                svc = services[i // every % len(services)]
+                files[svc].write(f"{stamp} honeypot_{svc} src_ip={ip} src_port={1024 + i % 60000}\n")
+            else:
+                files["journal"].write(
+                    f"{stamp}+0000 lyra endlessh-go[812]: ts={stamp}Z ACCEPT host={ip} port={1024 + i % 60000}\n"
+                )
+    finally:
+        for f in files.values():
+            f.close()
+    return paths
+
+def write_decisions(path, count):
+    """`cscli decisions list -o json` output with `count` community decisions."""
+    alerts = [
+        {"source": {"cn": "NL", "as_name": "BENCH-AS"},
+         "decisions": [{"value": f"100.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}",
+                        "scenario": "crowdsecurity/ssh-bf", "duration": "71h59m",
+                        "origin": "CAPI"}]}
+        for i in range(count)
+    ]
+    path.write_text(json.dumps(alerts))
+
+# ── Single run ────────────────────────────────────────────────────────────────
+
+def load_dashboard():
+    spec = importlib.util.spec_from_file_location("lyra_dashboard", DASHBOARD)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def peak_rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def dir_bytes(path):
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+def run_single(lines, args):
+    """Benchmark one log size in this process and return the result dict."""
+    with tempfile.TemporaryDirectory(prefix="lyra-bench-") as tmp:
+        tmp = Path(tmp)
+        bin_dir = tmp / "bin"
+        bin_dir.mkdir()
+        install_fakes(bin_dir)
+        dash = load_dashboard()
+        paths = write_logs(tmp, lines, args.ips, args.honeypot_share, dash.HONEYPOT_SERVICES)
+        write_decisions(tmp / "decisions.json", args.decisions)
+        (tmp / "crowdsec.yaml").touch()
+        os.environ["PATH"]          = f"{bin_dir}:{os.environ['PATH']}"
+        os.environ["BENCH_DIR"]     = str(tmp)
+        os.environ["BENCH_JOURNAL"] = str(paths["journal"])
+
+        out = tmp / "out"
+        out.mkdir()
+        dash.OUTPUT_DIR    = out
+        dash.OUTPUT_FILE   = out / "index.html"
+        dash.STATE_FILE    = out / "state.json"
+        dash.HITS_DB       = out / "hits.sqlite"
+        dash.DATA_DIR      = out / "data"
+        dash.HONEYPOT_LOGS = tmp / "honeypot"
+        dash.LAPI_KEY_FILE = tmp / "no-lapi-key"
+        dash._cscli_config = str(tmp / "crowdsec.yaml")
+
+        result = {"lines": lines, "ips": args.ips}
+        devnull = open(os.devnull, "w")
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            def stage(name, fn, *a):
+                t0 = time.perf_counter()
+                value = fn(*a)
+                result[f"{name}_s"] = round(time.perf_counter() - t0, 3)
+                result[f"{name}_rss_kb"] = peak_rss_kb()
+                return value
+
+            state, db = {}, dash.open_hits()
+            endlessh  = stage("endlessh", dash.get_endlessh_hits, state, db)
+            honeypot  = stage("honeypot", dash.get_honeypot_hits, state)
+            hits      = dash.extend_hits(endlessh, honeypot)
+            stage("record", dash.record_hits, db, hits)
+            decisions = stage("decisions", dash.get_crowdsec_decisions)
+            offenders = stage("ban", dash.ban_candidates, state, db, hits)
+            new_bans  = stage("ban_import", dash.auto_ban_repeat_offenders, offenders, decisions)
+            decisions += [dash.ban_decision(ip) for ip, _ in new_bans]
+            stage("render", dash.write_dashboard, db, decisions, new_bans, state)
+
+            t0 = time.perf_counter()
+            again = dash.extend_hits(dash.get_endlessh_hits(state, db), dash.get_honeypot_hits(state))
+            result["rerun_s"] = round(time.perf_counter() - t0, 3)
+            db.close()
+        finally:
+            sys.stdout = stdout
+            devnull.close()
+
+        result.update({
+            "hits":         len(hits["time"]),
+            "rerun_hits":   len(again["time"]),
+            "bans":         len(new_bans),
+            "ranges":       sum(1 for ip, _ in new_bans if "/" in ip),
+            "html_bytes":   dash.OUTPUT_FILE.stat().st_size,
+            "data_bytes":   dir_bytes(dash.DATA_DIR),
+            "db_bytes":     dash.HITS_DB.stat().st_size,
+            "state_bytes":  dash.STATE_FILE.stat().st_size,
+            "peak_rss_kb":  peak_rss_kb(),
+            "child_rss_kb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+        })
+        return result
+
+# ── Driver ────────────────────────────────────────────────────────────────────
+
+COLUMNS = [
+    ("lines", "lines"), ("hits", "hits"), ("endlessh_s", "journal s"),
+    ("honeypot_s", "logs s"), ("record_s", "record s"), ("decisions_s", "decisions s"),
+    ("ban_s", "ban s"), ("ban_import_s", "import s"), ("render_s", "render s"),
+    ("rerun_s", "rerun s"), ("bans", "bans"), ("ranges", "ranges"),
+    ("html_bytes", "html B"), ("data_bytes", "data B"), ("db_bytes", "db B"),
+    ("peak_rss_kb", "RSS KiB"),
+]
+# Lower is better for all of these; compared against --compare baselines.
+# Changes smaller than the noise floor are never reported.
+REGRESSION_KEYS = {
+    "endlessh_s": 0.05, "honeypot_s": 0.05, "record_s": 0.05, "decisions_s": 0.05,
+    "ban_s": 0.05, "ban_import_s": 0.05, "render_s": 0.02, "rerun_s": 0.02,
+    "peak_rss_kb": 4096, "html_bytes": 0, "data_bytes": 1024, "db_bytes": 65536,
+}
+
+def print_table(results):
+    widths = [max(len(title), *(len(str(r[key])) for r in results)) for key, title in COLUMNS]
+    print("  ".join(title.rjust(w) for (_, title), w in zip(COLUMNS, widths)))
+    for r in results:
+        print("  ".join(str(r[key]).rjust(w) for (key, _), w in zip(COLUMNS, widths)))
+
+def compare(results, baseline, tolerance):
+    """Print regressions against a saved baseline. Returns True if any."""
+    base = {r["lines"]: r for r in baseline["results"]}
+    regressed = False
+    for r in results:
+        b = base.get(r["lines"])
+        if b is None:
+            continue
+        for key, floor in REGRESSION_KEYS.items():
+            if b.get(key) and r[key] > b[key] * (1 + tolerance) and r[key] - b[key] > floor:
+                print(f"REGRESSION {r['lines']} lines: {key} {b[key]} -> {r[key]}")
+                regressed = True
+    return regressed
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the lyra dashboard against synthetic logs.")
+    parser.add_argument("--lines", default="10000,100000,1000000", help="comma-separated log sizes (lines)")
+    parser.add_argument("--ips", type=int, default=5000, help="distinct source IPs")
+    parser.add_argument("--honeypot-share", type=float, default=0.25, help="fraction of lines in honeypot logs")
+    parser.add_argument("--decisions", type=int, default=1000, help="decisions in the fake cscli list")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--save-baseline", metavar="PATH", help="write results as a baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare against a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown vs. baseline")
+    parser.add_argument("--single", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single is not None:
+        print(json.dumps(run_single(args.single, args)))
+        return
+
+    passthrough = [
+        "--ips", str(args.ips), "--honeypot-share", str(args.honeypot_share),
+        "--decisions", str(args.decisions),
+    ]
+    results = []
+    for n in (int(x) for x in args.lines.split(",")):
+        out = subprocess.run(
+            [sys.executable, __file__, *passthrough, "--single", str(n)],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        results.append(json.loads(out.strip().splitlines()[-1]))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(results)
+
+    config = {k: getattr(args, k) for k in ("ips", "honeypot_share", "decisions")}
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps({"config": config, "results": results}, indent=2))
+        print(f"Baseline saved to {args.save_baseline}")
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        if baseline.get("config") != config:
+            print(f"Note: baseline config differs: {baseline.get('config')}")
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+        print("No regressions against baseline")
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,9 @@
 # hosts/lyra/dashboard.nix
 #
 # Threat dashboard for lyra.
-# Generates static HTML every 5 minutes from endlessh + honeypot logs + CrowdSec.
+# Resident service: follows endlessh + honeypot logs live, bans repeat
+# offenders through CrowdSec as they cross the threshold, and re-renders
+# static HTML on a debounce.
 # Served by Caddy on threats.xesh.cc — accessible from WireGuard + home VLANs.
 { config, pkgs, ... }:
 let
@@ -12,33 +14,46 @@ let
 in
 {
   systemd.services.honeypot-dashboard = {
-    description = "Generate honeypot threat dashboard";
+    description = "Honeypot threat dashboard and auto-ban";
+    wantedBy = [ "multi-user.target" ];
+    after = [ "crowdsec.service" ];
+    wants = [ "crowdsec.service" ];
+    environment.PYTHONUNBUFFERED = "1";   # log bans to the journal as they happen
+    # ── Bouncer key for reading decisions straight from the LAPI ──────────
+    preStart = ''
+      KEY=/var/lib/crowdsec/honeypot-dashboard.key
+      if [ ! -s "$KEY" ]; then
+        CONFIG=$(grep -o '/nix/store/[^ ]*-crowdsec.yaml' /etc/systemd/system/crowdsec.service | head -n1)
+        (umask 077; head -c 24 /dev/urandom | od -An -tx1 | tr -d ' \n' > "$KEY.tmp")
+        if cscli -c "$CONFIG" bouncers add honeypot-dashboard -k "$(cat "$KEY.tmp")" >/dev/null; then
+          mv "$KEY.tmp" "$KEY"
+        else
+          rm -f "$KEY.tmp"
+        fi
+      fi
+    '';
     serviceConfig = {
-      Type            = "oneshot";
-      ExecStart       = dashboardScript;
+      Type            = "simple";
+      ExecStart       = "${dashboardScript} --follow";
+      Restart         = "always";
+      RestartSec      = "10s";
       SupplementaryGroups = [ "systemd-journal" ];
     };
     # ── Critical: add cscli and journalctl to PATH ────────────────────────
     path = with pkgs; [
-      crowdsec          # provides cscli for banning
+      crowdsec          # provides cscli for banning and bouncer registration
+      coreutils gnugrep # key generation in preStart
       systemd           # provides journalctl for endlessh logs
     ];
   };
 
-  systemd.timers.honeypot-dashboard = {
-    description = "Regenerate honeypot dashboard every 5 minutes";
-    wantedBy    = [ "timers.target" ];
-    timerConfig = {
-      OnBootSec       = "1min";
-      OnUnitActiveSec = "5min";
-      Persistent      = true;
-    };
-  };
-
   services.caddy.virtualHosts."http://threats.xesh.cc" = {
     extraConfig = ''
       root * /var/lib/honeypot-dashboard
-      file_server
+      file_server {
+        # Generator state lives next to the page
+        hide state.json *.tmp hits.sqlite hits.sqlite-journal
+      }
       @blocked not remote_ip 10.200.0.0/24 10.40.0.0/16
       abort @blocked
     '';
@@ -2,20 +2,38 @@
 # hosts/lyra/generate-dashboard.py
 #
 # Generates static HTML dashboard + auto-bans repeat honeypot offenders.
-# Run every 5 minutes via systemd timer (honeypot-dashboard.service).
-# Output: /var/lib/honeypot-dashboard/index.html
+# Runs resident with --follow (honeypot-dashboard.service): tails the endlessh
+# journal and honeypot logs live, bans as soon as a rule matches and
+# re-renders on a debounce. Without --follow it does one pass and exits.
+# Output: /var/lib/honeypot-dashboard/index.html + data/*.json.gz pages
 
 import subprocess
+import ctypes
+import http.client
+import ipaddress
 import json
+import os
+import tempfile
 import re
 import glob
-from datetime import datetime, timedelta
-from collections import Counter
+import gzip
+import select
+import signal
+import sqlite3
+import sys
+import time
+from array import array
+from bisect import bisect_right, insort
+from functools import lru_cache
+from datetime import datetime
 from pathlib import Path
+from urllib.parse import urlsplit
 
 OUTPUT_DIR     = Path("/var/lib/honeypot-dashboard")
 OUTPUT_FILE    = OUTPUT_DIR / "index.html"
 STATE_FILE     = OUTPUT_DIR / "state.json"
+HITS_DB        = OUTPUT_DIR / "hits.sqlite"
+DATA_DIR       = OUTPUT_DIR / "data"         # gzipped JSON pages fetched by the page
 HONEYPOT_LOGS  = Path("/var/log/honeypot")
 
 # ── Tunable config ────────────────────────────────────────────────────────────
@@ -24,14 +42,86 @@ BAN_WINDOW_HOURS = 24
 BAN_DURATION     = "168h"
 BAN_REASON       = "honeypot-repeat-offender"
 
+# An IP is banned once any rule matches: (weighted hits, window in hours).
+# e.g. ((3, 1), (10, 24)) bans quick bursts and slow, steady probing.
+BAN_RULES          = ((BAN_THRESHOLD, BAN_WINDOW_HOURS),)
+BAN_BUCKET_SECONDS = 300
+# Weight of one hit per service; services not listed (the tarpit) don't count
+SERVICE_WEIGHTS    = {"Fake FTP": 1, "Fake TELNET": 1, "Fake MYSQL": 1}
+# Offenders that share a network are banned as one Range decision instead:
+# {(IP version, prefix length): offenders needed}, broadest match wins.
+# e.g. {(4, 24): 3, (4, 16): 20, (6, 48): 5}
+RANGE_BAN_RULES    = {(4, 24): 3, (6, 64): 3}
+
+# Hits are read incrementally — endlessh-go from the journal cursor, honeypot
+# logs from each file's inode + byte offset, both saved in STATE_FILE — and
+# appended to HITS_DB. Raw hits are kept for HIT_RETENTION_DAYS; per-IP
+# totals are kept forever.
+ENDLESSH_UNIT      = "endlessh-go"
+TARPIT_SERVICE     = "SSH tarpit"
+HONEYPOT_SERVICES  = ("ftp", "telnet", "mysql")
+HIT_RETENTION_DAYS = 7
+LOG_HEAD_BYTES     = 64   # start of each log kept to spot copytruncate-style rewrites
+
+# Hits are held column-wise (see new_hits) and stored as integers: epoch
+# seconds, an attacker id and an index into SERVICES
+SERVICES = (TARPIT_SERVICE,) + tuple(f"Fake {svc.upper()}" for svc in HONEYPOT_SERVICES)
+
+# Decisions come from the local API's decision stream as a bouncer (key
+# registered by dashboard.nix) and are cached in memory; cscli is the
+# fallback when the key or the API is unavailable
+LAPI_CREDENTIALS = Path("/var/lib/crowdsec/local_api_credentials.yaml")
+LAPI_KEY_FILE    = Path("/var/lib/crowdsec/honeypot-dashboard.key")
+LAPI_TIMEOUT     = 10
+CROWDSEC_UNIT    = Path("/etc/systemd/system/crowdsec.service")
+CURRENT_SYSTEM   = Path("/run/current-system")
+
+# Follow mode: new hits are banned on arrival; the page is re-rendered at most
+# every FOLLOW_RENDER_SECONDS while hits come in, and every
+# FOLLOW_IDLE_SECONDS regardless so ages and expiries stay current
+FOLLOW_RENDER_SECONDS    = 10
+FOLLOW_IDLE_SECONDS      = 300
+FOLLOW_DECISIONS_SECONDS = 60
+FOLLOW_POLL_SECONDS      = 1     # honeypot log polling when inotify is unavailable
+BAN_NOTICE_SECONDS       = 300   # how long a new auto-ban stays in the page banner
+PAGE_REFRESH_SECONDS     = 60
+
+# The page is a fixed-size shell; its tables are paged from DATA_DIR
+SHARD_ROWS    = 100
+TOP_ATTACKERS = 100
+RECENT_HITS   = 1000
+
 # ── CrowdSec helpers ──────────────────────────────────────────────────────────
 
-def get_cscli_config():
-    """Find CrowdSec config in Nix store — path changes on every rebuild."""
-    matches = glob.glob("/nix/store/*-crowdsec.yaml")
-    if matches:
-        return matches[0]
-    return None
+_cscli_config = None
+
+def get_cscli_config(state=None):
+    """Find CrowdSec config in Nix store — path changes on every rebuild.
+
+    Taken from the crowdsec unit's command line, else a /nix/store glob.
+    Resolved once per process and, with `state`, once per system
+    generation (the /run/current-system target).
+    """
+    global _cscli_config
+    if _cscli_config and os.path.exists(_cscli_config):
+        return _cscli_config
+    generation = os.path.realpath(CURRENT_SYSTEM)
+    cached = (state or {}).get("cscli_config", {})
+    if cached.get("generation") == generation and os.path.exists(cached.get("path", "")):
+        _cscli_config = cached["path"]
+        return _cscli_config
+
+    try:
+        matches = re.findall(r'/nix/store/\S+-crowdsec\.yaml', CROWDSEC_UNIT.read_text())
+    except OSError:
+        matches = []
+    matches = matches or glob.glob("/nix/store/*-crowdsec.yaml")
+    if not matches:
+        return None
+    _cscli_config = matches[0]
+    if state is not None:
+        state["cscli_config"] = {"generation": generation, "path": _cscli_config}
+    return _cscli_config
 
 def run_cscli(*args):
     """Run cscli with the correct NixOS config path."""
@@ -52,56 +142,342 @@ def load_state():
         return {"last_ban_time": None, "total_ever_banned": 0}
 
 def save_state(state):
+    # Atomic: a torn write would lose the journal cursor and log offsets
     try:
-        STATE_FILE.write_text(json.dumps(state, indent=2))
+        tmp = STATE_FILE.with_suffix(".tmp")
+        tmp.write_text(json.dumps(state, separators=(",", ":")))
+        os.replace(tmp, STATE_FILE)
     except Exception:
         pass
 
+# ── Hit tables ────────────────────────────────────────────────────────────────
+
+_ips = {"id": {}, "addr": []}   # address -> intern_ip id, and back
+
+def intern_ip(addr):
+    """Small int id for an address, stable until forget_ips()."""
+    ip = _ips["id"].get(addr)
+    if ip is None:
+        ip = _ips["id"][addr] = len(_ips["addr"])
+        _ips["addr"].append(addr)
+    return ip
+
+def forget_ips():
+    """Drop every intern_ip id; only once no hit table holding them is still in use."""
+    _ips["id"].clear()
+    _ips["addr"].clear()
+
+def new_hits():
+    """Empty hit table: parallel columns of epoch seconds, intern_ip ids and SERVICES indexes.
+
+    13 bytes a hit, against a couple of hundred for a tuple of strings.
+    """
+    return {"time": array("q"), "ip": array("I"), "service": array("B")}
+
+def add_hit(hits, t, addr, service):
+    hits["time"].append(t)
+    hits["ip"].append(intern_ip(addr))
+    hits["service"].append(service)
+
+def extend_hits(hits, more):
+    for column in hits:
+        hits[column].extend(more[column])
+    return hits
+
+def hits_after(hits, t):
+    """The hits of a time-ordered table that are newer than epoch `t`."""
+    start = bisect_right(hits["time"], t)
+    return {column: values[start:] for column, values in hits.items()}
+
+def hits_from_rows(rows):
+    """Hit table from (time, address, service) rows."""
+    hits = new_hits()
+    for t, addr, service in rows:
+        add_hit(hits, t, addr, service)
+    return hits
+
+@lru_cache(maxsize=1024)
+def minute_epoch(minute):
+    return int(datetime.strptime(minute, "%Y-%m-%dT%H:%M").timestamp())
+
+def local_epoch(t):
+    """Epoch seconds of a local "YYYY-MM-DDTHH:MM:SS..." log time; strptime runs once a minute."""
+    return minute_epoch(t[:16]) + int(t[17:19])
+
+def local_time(epoch):
+    return datetime.fromtimestamp(epoch).strftime("%Y-%m-%dT%H:%M:%S")
+
 # ── Data collection ───────────────────────────────────────────────────────────
 
-def get_endlessh_hits():
-    """Read endlessh-go ACCEPT events from journald (last 7 days only)."""
-    hits = []
-    try:
-        result = subprocess.run(
-            ["journalctl", "-u", "endlessh-go", "--no-pager",
-             "-o", "short-iso", "--since", "7 days ago"],
-            capture_output=True, text=True, timeout=30
-        )
-        for line in result.stdout.splitlines():
+def read_endlessh_journal(cursor=None, since=None):
+    """New endlessh-go ACCEPT events after `cursor`, else from `since` (or the last 7 days).
+
+    Returns (hit table, cursor of the last entry read or None). Output is
+    streamed, so a week of entries is never held as text.
+    Raises on journalctl failure, e.g. a cursor that has been vacuumed.
+    """
+    cmd = ["journalctl", "-u", ENDLESSH_UNIT, "--no-pager", "-q",
+           "-o", "short-iso", "--show-cursor"]
+    if cursor:
+        cmd += ["--after-cursor", cursor]
+    else:
+        cmd += ["--since", since or f"{HIT_RETENTION_DAYS} days ago"]
+    hits, new_cursor = new_hits(), None
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          text=True, errors="replace") as proc:
+        for line in proc.stdout:
+            if line.startswith("-- cursor: "):
+                new_cursor = line[len("-- cursor: "):].rstrip("\n")
+                continue
             m = re.search(r'ACCEPT host=(\S+)', line)
             if m:
-                ts_m = re.match(r'(\S+)', line)
-                hits.append({
-                    "time":    ts_m.group(1) if ts_m else "",
-                    "ip":      m.group(1),
-                    "service": "SSH tarpit",
-                })
+                try:
+                    add_hit(hits, local_epoch(line), m.group(1), 0)
+                except ValueError:
+                    pass
+        stderr = proc.stderr.read()
+    if proc.returncode != 0:
+        raise RuntimeError(stderr.strip() or f"journalctl exited {proc.returncode}")
+    return hits, new_cursor
+
+def get_endlessh_hits(state, db):
+    """Hit table of new endlessh-go hits since state["journal_cursor"].
+
+    If the cursor has been vacuumed, reading resumes after the newest
+    tarpit hit already in `db`. `state` is updated in place.
+    """
+    cursor = state.get("journal_cursor")
+    try:
+        try:
+            new, new_cursor = read_endlessh_journal(cursor)
+        except RuntimeError as e:
+            if not cursor:
+                raise
+            last = db.execute("SELECT MAX(time) FROM hits WHERE service = 0").fetchone()[0]
+            since = last and local_time(last).replace("T", " ")
+            print(f"Warning: journal cursor no longer valid ({e}), re-reading from {since or 'the start'}")
+            new, new_cursor = read_endlessh_journal(since=since)
+            if last:
+                new = hits_after(new, last)
+        if new_cursor:
+            state["journal_cursor"] = new_cursor
+        return new
     except Exception as e:
         print(f"Warning: could not read endlessh journal: {e}")
-    return hits
+        return new_hits()
+
+def follow_endlessh_journal(cursor=None):
+    """journalctl following endlessh-go from `cursor` (else from now), one JSON entry per line."""
+    cmd = ["journalctl", "-u", ENDLESSH_UNIT, "--no-pager", "-q", "-f", "-o", "json"]
+    cmd += ["--after-cursor", cursor] if cursor else ["-n", "0"]
+    return subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+def parse_journal_entry(line, state, hits):
+    """Add an endlessh-go ACCEPT entry in `journalctl -o json` output to `hits`.
+
+    state["journal_cursor"] is advanced past every entry, hit or not.
+    """
+    try:
+        entry = json.loads(line)
+    except ValueError:
+        return
+    state["journal_cursor"] = entry.get("__CURSOR", state.get("journal_cursor"))
+    message = entry.get("MESSAGE") or ""
+    if isinstance(message, list):   # journald hands non-UTF-8 messages over as bytes
+        message = bytes(message).decode(errors="replace")
+    m = re.search(r'ACCEPT host=(\S+)', message)
+    if m:
+        add_hit(hits, int(entry.get("__REALTIME_TIMESTAMP", 0)) // 1000000, m.group(1), 0)
 
-def get_honeypot_hits():
-    """Read fake service log files."""
-    hits = []
-    for svc in ("ftp", "telnet", "mysql"):
+def tail_lines(path, pos):
+    """Yield complete lines appended to `path` since `pos`, updating it as they go.
+
+    `pos` is {"inode", "offset", "head"}. A new inode means logrotate moved
+    the file: the rest of the old one is read from path.1 (delaycompress
+    keeps it uncompressed for a day) before the new file is read from the
+    start. A file that is shorter than the offset, or whose first line
+    changed, was truncated and is read from the start. A trailing partial
+    line is left for the next run.
+    """
+    try:
+        inode, size = path.stat().st_ino, path.stat().st_size
+        with open(path, "rb") as f:
+            head = f.readline(LOG_HEAD_BYTES).decode(errors="replace")
+    except FileNotFoundError:
+        return
+    offset = pos.get("offset", 0)
+    if pos.get("inode") not in (None, inode):
+        rotated = path.with_name(path.name + ".1")
+        try:
+            if rotated.stat().st_ino == pos["inode"]:
+                yield from read_lines(rotated, offset, {})
+            else:
+                print(f"Warning: {path} was rotated and the old file is gone, skipping its tail")
+        except FileNotFoundError:
+            pass
+        offset = 0
+    elif size < offset or head != pos.get("head", head):
+        offset = 0
+    pos.update(inode=inode, offset=offset, head=head)
+    yield from read_lines(path, offset, pos)
+
+def read_lines(path, offset, pos):
+    """Stream complete lines from byte `offset`, advancing pos["offset"] past each."""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break
+            offset += len(raw)
+            pos["offset"] = offset
+            yield raw.decode(errors="replace")
+
+def parse_honeypot_lines(lines):
+    """(epoch, ip) for each honeypot line in a stream of log lines."""
+    for line in lines:
+        m = re.search(r'(\S+) honeypot_\w+ src_ip=(\S+)', line)
+        if m:
+            try:
+                yield local_epoch(m.group(1)), m.group(2)
+            except ValueError:
+                pass
+
+def get_honeypot_hits(state):
+    """Hit table of new fake service hits.
+
+    Each log is streamed from the inode and offset in state["honeypot_logs"],
+    so memory and time follow the new lines, not the size of the logs.
+    `state` is updated in place.
+    """
+    positions = state.setdefault("honeypot_logs", {})
+    hits = new_hits()
+    for code, svc in enumerate(HONEYPOT_SERVICES, 1):
         log = HONEYPOT_LOGS / f"{svc}.log"
-        if not log.exists():
-            continue
         try:
-            for line in log.read_text().splitlines():
-                m = re.search(r'(\S+) honeypot_\w+ src_ip=(\S+)', line)
-                if m:
-                    hits.append({
-                        "time":    m.group(1),
-                        "ip":      m.group(2),
-                        "service": f"Fake {svc.upper()}",
-                    })
+            for t, ip in parse_honeypot_lines(tail_lines(log, positions.setdefault(svc, {}))):
+                add_hit(hits, t, ip, code)
         except Exception as e:
             print(f"Warning: could not read {log}: {e}")
     return hits
 
+IN_MODIFY, IN_MOVED_TO, IN_CREATE = 0x002, 0x080, 0x100
+
+def watch_logs(path):
+    """Non-blocking inotify fd that turns readable when files in `path` change, or None.
+
+    Watching the directory also catches logrotate moving a log away and
+    the new file being created.
+    """
+    try:
+        libc  = ctypes.CDLL(None, use_errno=True)
+        fd    = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(fd, os.fsencode(path), IN_MODIFY | IN_MOVED_TO | IN_CREATE) < 0:
+            err = ctypes.get_errno()
+            os.close(fd)
+            raise OSError(err, os.strerror(err))
+        return fd
+    except (OSError, AttributeError) as e:
+        print(f"Warning: cannot watch {path} ({e}), polling every {FOLLOW_POLL_SECONDS}s")
+        return None
+
+def drain(fd):
+    """Discard everything waiting on a non-blocking fd."""
+    try:
+        while os.read(fd, 65536):
+            pass
+    except BlockingIOError:
+        pass
+
+_lapi = {"conn": None, "decisions": None}   # keep-alive connection, decision cache by id
+
+def lapi_url():
+    """Local API URL from the machine credentials crowdsec writes."""
+    try:
+        m = re.search(r'^url:\s*(\S+)', LAPI_CREDENTIALS.read_text(), re.M)
+        if m:
+            return m.group(1)
+    except OSError:
+        pass
+    return "http://127.0.0.1:8080/"
+
+def lapi_get(path):
+    """GET a local API path as the dashboard bouncer and return the parsed JSON.
+
+    One keep-alive connection is reused for the life of the process and
+    re-opened once if the server has dropped it.
+    """
+    key = LAPI_KEY_FILE.read_text().strip()
+    if _lapi["conn"] is None:
+        url = urlsplit(lapi_url())
+        _lapi["conn"] = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=LAPI_TIMEOUT)
+    conn = _lapi["conn"]
+    for attempt in (1, 2):
+        try:
+            conn.request("GET", path, headers={"X-Api-Key": key, "User-Agent": "honeypot-dashboard"})
+            resp = conn.getresponse()
+            body = resp.read()
+            break
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            if attempt == 2:
+                raise
+    if resp.status != 200:
+        raise RuntimeError(f"{path}: HTTP {resp.status} {body[:200].decode(errors='replace')}")
+    return json.loads(body or b"null")
+
+def go_duration(text):
+    """Seconds in a Go duration such as "167h59m3.5s"."""
+    units = {"h": 3600, "m": 60, "s": 1, "ms": 1e-3, "us": 1e-6, "µs": 1e-6, "ns": 1e-9}
+    return sum(float(n) * units[u] for n, u in re.findall(r'(-?[\d.]+)(h|ms|us|µs|ns|m|s)', text))
+
+def format_remaining(seconds):
+    seconds = max(0, int(seconds))
+    return f"{seconds // 3600}h{seconds % 3600 // 60}m"
+
+def sync_decisions():
+    """Bring the in-memory decision cache up to date and return it.
+
+    The first pull of each process opens /v1/decisions/stream with
+    startup=true, which returns every active decision, so nothing pulled
+    by an earlier process can be missed; after that LAPI only returns the
+    decisions added and deleted since this bouncer's last pull. Expired
+    entries are dropped locally as well.
+    """
+    cache = _lapi["decisions"]
+    startup = cache is None
+    data = lapi_get("/v1/decisions/stream" + ("?startup=true" if startup else "")) or {}
+    cache = {} if startup else dict(cache)
+    now = time.time()
+    for d in data.get("deleted") or []:
+        cache.pop(str(d.get("id")), None)
+    for d in data.get("new") or []:
+        cache[str(d.get("id"))] = {
+            "ip":     d.get("value", ""),
+            "reason": d.get("scenario", ""),
+            "origin": d.get("origin", ""),
+            "until":  now + go_duration(d.get("duration", "0s")),
+        }
+    _lapi["decisions"] = {k: d for k, d in cache.items() if d["until"] > now}
+    return _lapi["decisions"]
+
 def get_crowdsec_decisions():
+    """Active decisions, from the LAPI stream cache if possible, else `cscli decisions list`.
+
+    The stream carries no alert data, so country and AS are only filled in
+    on the cscli path.
+    """
+    if LAPI_KEY_FILE.exists():
+        try:
+            now = time.time()
+            return [
+                {"ip": d["ip"], "reason": d["reason"], "country": "", "as": "",
+                 "expires": format_remaining(d["until"] - now), "origin": d["origin"]}
+                for d in sync_decisions().values()
+            ]
+        except Exception as e:
+            print(f"Warning: CrowdSec LAPI unavailable, falling back to cscli: {e}")
     try:
         result = run_cscli("decisions", "list", "-o", "json")
         if result.returncode != 0:
@@ -127,142 +503,396 @@ def get_crowdsec_decisions():
         return []
 
 
+# ── Hit store ─────────────────────────────────────────────────────────────────
+
+HITS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS attackers (
+    id         INTEGER PRIMARY KEY,
+    ip         TEXT NOT NULL UNIQUE,
+    hits       INTEGER NOT NULL,
+    first_seen INTEGER NOT NULL,   -- epoch seconds
+    last_seen  INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS attackers_hits      ON attackers (hits);
+CREATE INDEX IF NOT EXISTS attackers_last_seen ON attackers (last_seen);
+CREATE TABLE IF NOT EXISTS hits (
+    time     INTEGER NOT NULL,     -- epoch seconds
+    attacker INTEGER NOT NULL,     -- attackers.id
+    service  INTEGER NOT NULL      -- index into SERVICES
+);
+CREATE INDEX IF NOT EXISTS hits_time          ON hits (time);
+CREATE INDEX IF NOT EXISTS hits_attacker_time ON hits (attacker, time);
+CREATE INDEX IF NOT EXISTS hits_service_time  ON hits (service, time);
+"""
+
+def open_hits(path=None):
+    db = sqlite3.connect(path or HITS_DB)
+    db.executescript(HITS_SCHEMA)
+    return db
+
+def hits_since(hours):
+    """HITS_DB time value `hours` ago."""
+    return int(time.time()) - hours * 3600
+
+def record_hits(db, hits):
+    """Append a hit table to HITS_DB, update per-IP totals and prune old rows."""
+    per_ip = {}
+    for t, ip in zip(hits["time"], hits["ip"]):
+        total = per_ip.get(ip)
+        if total is None:
+            per_ip[ip] = [1, t, t]
+        else:
+            total[0] += 1
+            total[1] = min(total[1], t)
+            total[2] = max(total[2], t)
+    attacker = {}
+    with db:
+        for ip, (count, first, last) in per_ip.items():
+            attacker[ip] = db.execute(
+                "INSERT INTO attackers (ip, hits, first_seen, last_seen) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (ip) DO UPDATE SET hits = hits + excluded.hits, "
+                "first_seen = min(first_seen, excluded.first_seen), "
+                "last_seen = max(last_seen, excluded.last_seen) "
+                "RETURNING id",
+                (_ips["addr"][ip], count, first, last),
+            ).fetchone()[0]
+        db.executemany(
+            "INSERT INTO hits (time, attacker, service) VALUES (?, ?, ?)",
+            zip(hits["time"], map(attacker.__getitem__, hits["ip"]), hits["service"]),
+        )
+        db.execute("DELETE FROM hits WHERE time < ?", (hits_since(HIT_RETENTION_DAYS * 24),))
+
 # ── Auto-ban logic ────────────────────────────────────────────────────────────
 
-def auto_ban_repeat_offenders(honeypot_hits, already_banned):
-    """Ban IPs with BAN_THRESHOLD+ fake-service hits in BAN_WINDOW_HOURS."""
-    window_start = datetime.now() - timedelta(hours=BAN_WINDOW_HOURS)
-    recent = []
+def count_ban_windows(windows, hits, now=None):
+    """Add a hit table to per-IP sliding-window counters (in place).
 
-    for hit in honeypot_hits:
-        try:
-            ts = datetime.fromisoformat(hit["time"][:19].replace("T", " "))
-            if ts > window_start:
-                recent.append(hit["ip"])
-        except Exception:
-            pass
+    `windows` maps ip -> [[bucket, weight], ...], oldest bucket first, and
+    is ordered by last update. Buckets that fall out of the longest
+    BAN_RULES window are expired from the front of each ring and from the
+    front of `windows`, so a run only does work for its new hits.
+    Returns {ip: (weighted hits, window hours)} for IPs touched by `hits`
+    that now match a rule.
+    """
+    now_bucket = int(now or time.time()) // BAN_BUCKET_SECONDS
+    oldest = now_bucket - max(hours for _, hours in BAN_RULES) * 3600 // BAN_BUCKET_SECONDS
 
-    new_bans = []
-    for ip, count in Counter(recent).items():
-        if count < BAN_THRESHOLD or ip in already_banned:
+    weights = [SERVICE_WEIGHTS.get(name, 0) for name in SERVICES]
+    addr    = _ips["addr"]
+    touched = set()
+    for t, ip, svc in zip(hits["time"], hits["ip"], hits["service"]):
+        weight = weights[svc]
+        if not weight:
+            continue
+        bucket = t // BAN_BUCKET_SECONDS
+        if bucket <= oldest:
+            continue
+        ip = addr[ip]
+        ring = windows.pop(ip, [])
+        if ring and ring[-1][0] == bucket:
+            ring[-1][1] += weight
+        elif not ring or ring[-1][0] < bucket:
+            ring.append([bucket, weight])
+        else:
+            insort(ring, [bucket, weight])
+        windows[ip] = ring
+        touched.add(ip)
+
+    for ip in touched:
+        ring = windows[ip]
+        while ring and ring[0][0] <= oldest:
+            ring.pop(0)
+    while windows:
+        ip, ring = next(iter(windows.items()))
+        if ring and ring[-1][0] > oldest:
+            break
+        del windows[ip]
+
+    offenders = {}
+    for ip in touched:
+        for threshold, hours in BAN_RULES:
+            start = now_bucket - hours * 3600 // BAN_BUCKET_SECONDS
+            score = sum(weight for bucket, weight in windows[ip] if bucket > start)
+            if score >= threshold:
+                offenders[ip] = (score, hours)
+                break
+    return offenders
+
+def ban_candidates(state, db, hits):
+    """IPs the new hits push over a BAN_RULES threshold (see count_ban_windows).
+
+    The counters live in state["ban_windows"]; the first run after they
+    were introduced seeds them from the hits already in `db`.
+    """
+    if "ban_windows" not in state:
+        window = max(hours for _, hours in BAN_RULES)
+        hits = hits_from_rows(db.execute(
+            "SELECT h.time, a.ip, h.service FROM hits h JOIN attackers a ON a.id = h.attacker "
+            "WHERE h.time > ? ORDER BY h.time",
+            (hits_since(window),),
+        ))
+    return count_ban_windows(state.setdefault("ban_windows", {}), hits)
+
+def ban_rules_label():
+    return " or ".join(f"{threshold}+ hits/{hours}h" for threshold, hours in BAN_RULES)
+
+def range_rules_label():
+    return ", ".join(
+        f"{needed}+ offenders per /{plen}{'' if version == 4 else ' (IPv6)'}"
+        for (version, plen), needed in sorted(RANGE_BAN_RULES.items())
+    )
+
+def ban_decision(ip):
+    """A new auto-ban in get_crowdsec_decisions' shape, so the list needn't be re-read."""
+    return {
+        "ip":      ip,
+        "reason":  BAN_REASON,
+        "country": "",
+        "as":      "",
+        "expires": BAN_DURATION,
+        "origin":  "cscli-import",
+    }
+
+def prefix_tree_add(tree, value, count=True):
+    """Add an IP or CIDR to a binary prefix tree; returns False if it is neither.
+
+    `tree` maps IP version -> root node, and nodes are {"n": offenders
+    below, 0: child, 1: child}. An IP is counted in "n" on every node down
+    to the longest RANGE_BAN_RULES prefix for its version; a CIDR added
+    with count=False only marks its own node as a banned "range".
+    """
+    try:
+        net = ipaddress.ip_network(value, strict=False)
+    except ValueError:
+        return False
+    depth = net.prefixlen
+    if count:
+        depth = min(depth, max((plen for version, plen in RANGE_BAN_RULES if version == net.version), default=0))
+    node  = tree.setdefault(net.version, {"n": 0})
+    bits, width = int(net.network_address), net.max_prefixlen
+    for i in range(depth):
+        node["n"] += count
+        node = node.setdefault(bits >> (width - 1 - i) & 1, {"n": 0})
+    node["n"] += count
+    if not count:
+        node["range"] = True
+    return True
+
+def prefix_tree_covering(tree, addr):
+    """The banned range in `tree` that contains IP `addr`, else None."""
+    ip = ipaddress.ip_address(addr)
+    node, bits, width = tree.get(ip.version), int(ip), ip.max_prefixlen
+    for depth in range(width + 1):
+        if node is None:
+            return None
+        if node.get("range"):
+            return str(ipaddress.ip_network((bits >> (width - depth) << (width - depth), depth)))
+        if depth < width:
+            node = node.get(bits >> (width - 1 - depth) & 1)
+    return None
+
+def prefix_tree_ranges(tree):
+    """[(network, offenders)] for networks that meet RANGE_BAN_RULES, broadest first.
+
+    Networks inside a banned range, or inside one already returned, are skipped.
+    """
+    found = []
+    stack = [(version, root, 0, 0) for version, root in tree.items()]
+    while stack:
+        version, node, bits, depth = stack.pop()
+        if node.get("range"):
+            continue
+        needed = RANGE_BAN_RULES.get((version, depth))
+        if needed and node["n"] >= needed:
+            width = 32 if version == 4 else 128
+            found.append((str(ipaddress.ip_network((bits << (width - depth), depth))), node["n"]))
+            continue
+        for bit in (0, 1):
+            if bit in node:
+                stack.append((version, node[bit], bits << 1 | bit, depth + 1))
+    return found
+
+def auto_ban_repeat_offenders(offenders, decisions):
+    """Ban IPs from ban_candidates, {ip: (weighted hits, window hours)}.
+
+    New offenders go into a prefix tree with the IPs already auto-banned;
+    a network that reaches its RANGE_BAN_RULES threshold is banned as one
+    Range decision and the offenders inside it are not banned one by one.
+    All bans go to CrowdSec in one `cscli decisions import`, so a scanning
+    wave costs one cscli run rather than one per IP.
+    Returns [(ip or range, hits or offenders)].
+    """
+    banned_ips = {d["ip"] for d in decisions}
+    tree = {}
+    for d in decisions:
+        if "/" in d["ip"]:
+            prefix_tree_add(tree, d["ip"], count=False)
+        elif d.get("reason") == BAN_REASON:
+            prefix_tree_add(tree, d["ip"])
+
+    fresh = []
+    for ip, (count, hours) in offenders.items():
+        if ip in banned_ips:
             continue
         try:
-            result = run_cscli(
-                "decisions", "add",
-                "--ip", ip,
-                "--duration", BAN_DURATION,
-                "--reason", BAN_REASON
-            )
-            if result.returncode == 0:
-                new_bans.append((ip, count))
-                print(f"Auto-banned {ip} ({count} hits in {BAN_WINDOW_HOURS}h)")
-            else:
-                print(f"Failed to ban {ip}: {result.stderr.strip()}")
-        except Exception as e:
-            print(f"Failed to ban {ip}: {e}")
+            ipaddress.ip_address(ip)
+        except ValueError:
+            print(f"Failed to ban {ip}: not an IP address")
+            continue
+        if prefix_tree_covering(tree, ip):
+            continue
+        prefix_tree_add(tree, ip)
+        fresh.append((ip, count, hours))
+
+    to_ban = []
+    for net, count in prefix_tree_ranges(tree):
+        prefix_tree_add(tree, net, count=False)
+        to_ban.append((net, "Range", count, f"{count} offenders"))
+    to_ban += [
+        (ip, "Ip", count, f"{count:g} hits in {hours}h")
+        for ip, count, hours in fresh if not prefix_tree_covering(tree, ip)
+    ]
+    if not to_ban:
+        return []
 
+    batch = [
+        {"value": value, "scope": scope, "type": "ban",
+         "duration": BAN_DURATION, "reason": BAN_REASON}
+        for value, scope, _, _ in to_ban
+    ]
+    try:
+        with tempfile.NamedTemporaryFile("w", suffix=".json", prefix="bans-") as f:
+            json.dump(batch, f)
+            f.flush()
+            result = run_cscli("decisions", "import", "-i", f.name, "--format", "json")
+    except Exception as e:
+        result = None
+        error = str(e)
+    else:
+        error = result.stderr.strip()
+
+    new_bans = []
+    for value, _, count, label in to_ban:
+        if result is not None and result.returncode == 0:
+            new_bans.append((value, count))
+            print(f"Auto-banned {value} ({label})")
+        else:
+            print(f"Failed to ban {value}: {error}")
+    return new_bans
+
+def ban_new_hits(state, db, hits, decisions):
+    """Record a hit table and ban the IPs it pushes over a rule.
+
+    `decisions` gets the new bans appended, so it stays current without
+    asking CrowdSec again. Returns [(ip or range, hits or offenders)].
+    """
+    record_hits(db, hits)
+    new_bans = auto_ban_repeat_offenders(ban_candidates(state, db, hits), decisions)
+    if new_bans:
+        state["last_ban_time"]     = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        state["total_ever_banned"] = state.get("total_ever_banned", 0) + len(new_bans)
+        decisions += [ban_decision(ip) for ip, _ in new_bans]
     return new_bans
 
 # ── HTML generation ───────────────────────────────────────────────────────────
 
-def render_html(endlessh, honeypot, decisions, new_bans, state):
-    all_hits  = sorted(endlessh + honeypot, key=lambda x: x["time"], reverse=True)
-    all_ips   = [h["ip"] for h in all_hits]
-    top_ips   = Counter(all_ips).most_common(10)
-
-    total_tarpit      = len(endlessh)
-    total_honeypot    = len(honeypot)
-    total_banned      = len(decisions)
-    total_auto_banned = len([d for d in decisions if d.get("reason") == BAN_REASON])
-    total_ever_banned = state.get("total_ever_banned", 0)
-    last_ban_time     = state.get("last_ban_time") or "never"
-    now_str           = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-    def hit_rows(items, limit=100):
-        html = ""
-        for item in items[:limit]:
-            svc   = item.get("service", "")
-            color = "var(--red)" if "tarpit" in svc.lower() else "var(--yellow)"
-            html += (
-                f'<tr>'
-                f'<td>{item.get("time","")[:19]}</td>'
-                f'<td><code>{item.get("ip","")}</code></td>'
-                f'<td style="color:{color}">{svc}</td>'
-                f'</tr>'
-            )
-        return html
-
-    def decision_rows(items):
-        html = ""
-        for d in items:
-            autoban = d.get("reason") == BAN_REASON
-            manual  = d.get("origin") == "cscli" and not autoban
-            clr     = "var(--red)" if autoban else ("var(--purple)" if manual else "var(--yellow)")
-            lbl     = "⚡ auto-ban" if autoban else ("manual" if manual else "crowdsec")
-            fw      = "700" if autoban else "400"
-            row_bg  = ' style="background:rgba(248,81,73,0.07)"' if autoban else ""
-            html += (
-                f'<tr{row_bg}>'
-                f'<td><code>{d.get("ip","")}</code></td>'
-                f'<td>{d.get("country","")}</td>'
-                f'<td>{d.get("as","")[:35]}</td>'
-                f'<td>{d.get("reason","")}</td>'
-                f'<td style="color:{clr};font-weight:{fw}">{lbl}</td>'
-                f'<td>{d.get("expires","")}</td>'
-                f'</tr>'
-            )
-        return html
-
-    def top_rows(items):
-        if not items:
-            return ""
-        max_c = max(c for _, c in items)
-        html  = ""
-        for ip, count in items:
-            w = min(100, int(count / max_c * 100))
-            html += (
-                f'<tr>'
-                f'<td><code>{ip}</code></td>'
-                f'<td>'
-                f'<div style="display:flex;align-items:center;gap:8px">'
-                f'<div style="background:var(--red);height:8px;width:{w}%;'
-                f'border-radius:4px;min-width:4px"></div>'
-                f'<span>{count}</span>'
-                f'</div>'
-                f'</td>'
-                f'</tr>'
-            )
-        return html
+def dashboard_data(db, decisions, new_bans, state):
+    """Summary for data/index.json and the rows of each paged table.
 
-    ban_notice = ""
-    if new_bans:
-        items = " &nbsp;·&nbsp; ".join(
-            f'<code>{ip}</code> <span style="color:var(--muted)">({c} hits)</span>'
-            for ip, c in new_bans
+    Rows are short lists rather than objects to keep the shards small.
+    """
+    week_ago  = hits_since(HIT_RETENTION_DAYS * 24)
+    by_service = {
+        SERVICES[svc]: count for svc, count in db.execute(
+            "SELECT service, COUNT(*) FROM hits WHERE time >= ? GROUP BY service", (week_ago,)
         )
-        ban_notice = f'''
-        <div style="background:rgba(248,81,73,0.12);border:2px solid var(--red);
-                    border-radius:8px;padding:1.25rem;margin-bottom:1.5rem;
-                    display:flex;align-items:center;gap:1rem">
-          <span style="font-size:1.75rem">⚡</span>
-          <div>
-            <div style="color:var(--red);font-weight:700;font-size:0.9rem;
-                        text-transform:uppercase;letter-spacing:.05em;
-                        margin-bottom:.3rem">Auto-banned this run</div>
-            <div style="font-size:.875rem">{items}</div>
-          </div>
-        </div>'''
-
-    no_bans = '<tr><td colspan="6" style="color:var(--muted);text-align:center;padding:1.5rem">No active bans</td></tr>'
-    no_hits = '<tr><td colspan="3" style="color:var(--muted);text-align:center;padding:1.5rem">No hits yet</td></tr>'
-    no_top  = '<tr><td colspan="2" style="color:var(--muted);text-align:center;padding:1.5rem">No data</td></tr>'
+    }
+    unique_ips = db.execute(
+        "SELECT COUNT(*) FROM attackers WHERE last_seen >= ?", (week_ago,)
+    ).fetchone()[0]
+
+    def decision_row(d):
+        return [d.get("ip", ""), d.get("country", ""), d.get("as", "")[:35],
+                d.get("reason", ""), d.get("origin", ""), d.get("expires", "")]
+
+    summary = {
+        "generated":    datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "ban_reason":   BAN_REASON,
+        "tarpit":       by_service.pop(TARPIT_SERVICE, 0),
+        "honeypot":     sum(by_service.values()),
+        "unique_ips":   unique_ips,
+        "banned":       len(decisions),
+        "auto_banned":  len([d for d in decisions if d.get("reason") == BAN_REASON]),
+        "ever_banned":  state.get("total_ever_banned", 0),
+        "last_ban":     state.get("last_ban_time") or "never",
+        "new_bans":     new_bans,
+    }
+    tables = {
+        "ranges":    [decision_row(d) for d in decisions if "/" in d.get("ip", "")],
+        "decisions": [decision_row(d) for d in decisions if "/" not in d.get("ip", "")],
+        "top":       db.execute(
+            "SELECT ip, hits FROM attackers ORDER BY hits DESC LIMIT ?", (TOP_ATTACKERS,)
+        ).fetchall(),
+        "hits":      [
+            [local_time(t), ip, SERVICES[svc]]
+            for t, ip, svc in db.execute(
+                "SELECT h.time, a.ip, h.service FROM hits h JOIN attackers a ON a.id = h.attacker "
+                "ORDER BY h.time DESC LIMIT ?", (RECENT_HITS,)
+            )
+        ],
+    }
+    return summary, tables
+
+_shards = {}   # path -> bytes last written, so unchanged pages aren't rewritten
+
+def write_file(path, data):
+    """Atomically replace `path` with `data` unless it already holds it."""
+    if _shards.get(path) == data:
+        return
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+    _shards[path] = data
+
+def write_shards(name, rows):
+    """Write `rows` as gzipped JSON pages of SHARD_ROWS, data/<name>-<page>.json.gz.
+
+    Returns the page count.
+    """
+    pages = range(0, len(rows), SHARD_ROWS)
+    for page, start in enumerate(pages):
+        body = json.dumps(rows[start:start + SHARD_ROWS], separators=(",", ":")).encode()
+        write_file(DATA_DIR / f"{name}-{page}.json.gz", gzip.compress(body, mtime=0))
+    return len(pages)
+
+def prune_shards(name, pages):
+    """Delete pages of `name` past the current page count."""
+    for path in DATA_DIR.glob(f"{name}-*.json.gz"):
+        if int(path.name[len(name) + 1:-len(".json.gz")]) >= pages:
+            path.unlink(missing_ok=True)
+            _shards.pop(path, None)
 
+def render_html():
+    """The page shell; data/index.json and the shards are fetched by DASHBOARD_JS."""
+    def table(name, title, headers):
+        cols = "".join(f"<th>{h}</th>" for h in headers)
+        return f"""<section>
+  <h2>{title}</h2>
+  <table>
+    <thead><tr>{cols}</tr></thead>
+    <tbody id="{name}"><tr><td colspan="{len(headers)}" class="empty">Loading…</td></tr></tbody>
+  </table>
+  <div class="pager" data-table="{name}">
+    <button data-step="-1">‹ prev</button> <span></span> <button data-step="1">next ›</button>
+  </div>
+</section>"""
+
+    decision_headers = ("Country", "AS", "Reason", "Origin", "Expires")
     return f"""<!DOCTYPE html>
 <html lang="en">
 <head>
 <meta charset="UTF-8">
 <meta name="viewport" content="width=device-width,initial-scale=1">
-<meta http-equiv="refresh" content="300">
 <title>lyra — threat dashboard</title>
 <style>
 :root{{
@@ -289,105 +919,315 @@ section h2{{font-size:.9rem;color:var(--muted);text-transform:uppercase;letter-s
 table{{width:100%;border-collapse:collapse;background:var(--bg2);border-radius:8px;overflow:hidden}}
 th{{background:var(--bg3);color:var(--muted);font-size:.7rem;text-transform:uppercase;padding:.75rem 1rem;text-align:left}}
 td{{padding:.6rem 1rem;border-top:1px solid var(--border);font-size:.875rem}}
+td.empty{{color:var(--muted);text-align:center;padding:1.5rem}}
 tr:hover td{{background:var(--bg3)}}
 code{{color:var(--blue);background:var(--bg3);padding:.1em .4em;border-radius:3px;font-size:.85em}}
+.bar{{display:flex;align-items:center;gap:8px}}
+.bar div{{background:var(--red);height:8px;border-radius:4px;min-width:4px}}
+.pager{{color:var(--muted);font-size:.8rem;margin-top:.5rem;text-align:right}}
+.pager button{{background:var(--bg3);color:var(--text);border:1px solid var(--border);border-radius:4px;padding:.2rem .6rem;cursor:pointer}}
+.pager button:disabled{{opacity:.4;cursor:default}}
+#ban-notice{{display:none;background:rgba(248,81,73,0.12);border:2px solid var(--red);
+  border-radius:8px;padding:1.25rem;margin-bottom:1.5rem;align-items:center;gap:1rem}}
+#ban-notice .title{{color:var(--red);font-weight:700;font-size:0.9rem;text-transform:uppercase;letter-spacing:.05em;margin-bottom:.3rem}}
 .footer{{color:var(--muted);font-size:.75rem;margin-top:2rem;border-top:1px solid var(--border);padding-top:1rem}}
 </style>
 </head>
 <body>
 <h1>🛡 lyra — threat dashboard</h1>
 <p class="subtitle">
-  Updated: {now_str} &nbsp;·&nbsp;
-  Auto-refreshes every 5 min &nbsp;·&nbsp;
-  Auto-bans at {BAN_THRESHOLD}+ hits/{BAN_WINDOW_HOURS}h &nbsp;·&nbsp;
-  Last ban: {last_ban_time}
+  Updated: <span data-key="generated">–</span> &nbsp;·&nbsp;
+  Auto-refreshes every {PAGE_REFRESH_SECONDS}s &nbsp;·&nbsp;
+  Auto-bans at {ban_rules_label()} &nbsp;·&nbsp;
+  Last ban: <span data-key="last_ban">–</span>
 </p>
 
-{ban_notice}
+<div id="ban-notice">
+  <span style="font-size:1.75rem">⚡</span>
+  <div>
+    <div class="title">Auto-banned recently</div>
+    <div style="font-size:.875rem"></div>
+  </div>
+</div>
 
 <div class="grid">
   <div class="card red">
     <div class="label">SSH tarpit (7d)</div>
-    <div class="value">{total_tarpit}</div>
+    <div class="value" data-key="tarpit">–</div>
   </div>
   <div class="card yellow">
-    <div class="label">Honeypot hits</div>
-    <div class="value">{total_honeypot}</div>
+    <div class="label">Honeypot hits (7d)</div>
+    <div class="value" data-key="honeypot">–</div>
   </div>
   <div class="card blue">
-    <div class="label">Unique attackers</div>
-    <div class="value">{len(set(all_ips))}</div>
+    <div class="label">Unique attackers (7d)</div>
+    <div class="value" data-key="unique_ips">–</div>
   </div>
   <div class="card green">
     <div class="label">Active bans</div>
-    <div class="value">{total_banned}</div>
+    <div class="value" data-key="banned">–</div>
   </div>
   <div class="card" style="border-color:var(--red);background:rgba(248,81,73,0.08)">
     <div class="label" style="color:var(--red)">⚡ Auto-banned (active)</div>
-    <div class="value" style="color:var(--red)">{total_auto_banned}</div>
+    <div class="value" style="color:var(--red)" data-key="auto_banned">–</div>
   </div>
   <div class="card purple">
     <div class="label">Total ever banned</div>
-    <div class="value">{total_ever_banned}</div>
+    <div class="value" data-key="ever_banned">–</div>
   </div>
 </div>
 
-<section>
-  <h2>Active CrowdSec bans</h2>
-  <table>
-    <tr><th>IP</th><th>Country</th><th>AS</th><th>Reason</th><th>Origin</th><th>Expires</th></tr>
-    {decision_rows(decisions) or no_bans}
-  </table>
-</section>
+{table("ranges", "Banned ranges", ("Range",) + decision_headers)}
 
-<section>
-  <h2>Top attackers (all time)</h2>
-  <table>
-    <tr><th>IP</th><th>Hits</th></tr>
-    {top_rows(top_ips) or no_top}
-  </table>
-</section>
+{table("decisions", "Active CrowdSec bans", ("IP",) + decision_headers)}
 
-<section>
-  <h2>Recent hits (last 100)</h2>
-  <table>
-    <tr><th>Time</th><th>IP</th><th>Service</th></tr>
-    {hit_rows(all_hits) or no_hits}
-  </table>
-</section>
+{table("top", f"Top attackers (all time, top {TOP_ATTACKERS})", ("IP", "Hits"))}
+
+{table("hits", f"Recent hits (last {RECENT_HITS})", ("Time", "IP", "Service"))}
 
 <p class="footer">
-  lyra &nbsp;·&nbsp; {now_str} &nbsp;·&nbsp;
+  lyra &nbsp;·&nbsp; <span data-key="generated">–</span> &nbsp;·&nbsp;
   endlessh-go + honeypot (FTP/telnet/MySQL) + CrowdSec &nbsp;·&nbsp;
-  threshold: {BAN_THRESHOLD} hits/{BAN_WINDOW_HOURS}h → {BAN_DURATION} ban
+  threshold: {ban_rules_label()} → {BAN_DURATION} ban &nbsp;·&nbsp;
+  ranges: {range_rules_label() or "off"}
 </p>
+<script>
+const REFRESH_MS = {PAGE_REFRESH_SECONDS * 1000}, TARPIT = {json.dumps(TARPIT_SERVICE)};
+{DASHBOARD_JS}
+</script>
 </body>
 </html>"""
 
+# Client side of render_html: polls data/index.json and shows one page of
+# each table at a time, so the browser never holds more than SHARD_ROWS rows
+# per table whatever the number of decisions.
+DASHBOARD_JS = r"""
+const EMPTY = {ranges: "No range bans", decisions: "No active bans", top: "No data", hits: "No hits yet"};
+const page = {ranges: 0, decisions: 0, top: 0, hits: 0};
+let manifest = null, topMax = 1;
+
+async function shard(name, n) {
+  const res = await fetch(`data/${name}-${n}.json.gz?v=${encodeURIComponent(manifest.generated)}`);
+  if (!res.ok) throw new Error(`${name} page ${n}: HTTP ${res.status}`);
+  return new Response(res.body.pipeThrough(new DecompressionStream("gzip"))).json();
+}
+
+function cell(tr, text, style) {
+  const td = tr.insertCell();
+  td.textContent = text;
+  if (style) td.style.cssText = style;
+  return td;
+}
+
+function codeCell(tr, text) {
+  const code = document.createElement("code");
+  code.textContent = text;
+  tr.insertCell().append(code);
+}
+
+function decisionRow(tr, [ip, country, as, reason, origin, expires]) {
+  const autoban = reason === manifest.ban_reason;
+  const manual  = origin === "cscli" && !autoban;
+  const color   = autoban ? "var(--red)" : manual ? "var(--purple)" : "var(--yellow)";
+  if (autoban) tr.style.background = "rgba(248,81,73,0.07)";
+  codeCell(tr, ip);
+  cell(tr, country);
+  cell(tr, as);
+  cell(tr, reason);
+  cell(tr, autoban ? "⚡ auto-ban" : manual ? "manual" : "crowdsec",
+       `color:${color};font-weight:${autoban ? 700 : 400}`);
+  cell(tr, expires);
+}
+
+const ROW = {
+  ranges:    decisionRow,
+  decisions: decisionRow,
+  top(tr, [ip, count]) {
+    codeCell(tr, ip);
+    const bar = document.createElement("div"), fill = document.createElement("div");
+    bar.className = "bar";
+    fill.style.width = `${Math.min(100, Math.floor(count / topMax * 100))}%`;
+    bar.append(fill, String(count));
+    tr.insertCell().append(bar);
+  },
+  hits(tr, [time, ip, service]) {
+    cell(tr, time);
+    codeCell(tr, ip);
+    cell(tr, service, `color:${service === TARPIT ? "var(--red)" : "var(--yellow)"}`);
+  },
+};
+
+async function show(name) {
+  const body  = document.getElementById(name);
+  const pages = manifest.pages[name];
+  page[name]  = Math.max(0, Math.min(page[name], pages - 1));
+  let rows = [];
+  try {
+    if (pages) rows = await shard(name, page[name]);
+  } catch (err) {
+    rows = null;
+    console.error(err);
+  }
+  if (name === "top" && page[name] === 0 && rows && rows.length) topMax = rows[0][1];
+  body.replaceChildren();
+  if (!rows || !rows.length) {
+    const td = cell(body.insertRow(), rows ? EMPTY[name] : "Could not load data");
+    td.className = "empty";
+    td.colSpan = body.parentNode.tHead.rows[0].cells.length;
+  }
+  for (const row of rows || []) ROW[name](body.insertRow(), row);
+
+  const pager = document.querySelector(`.pager[data-table="${name}"]`);
+  pager.style.display = pages > 1 ? "" : "none";
+  pager.querySelector("span").textContent = `page ${page[name] + 1} of ${pages}`;
+  const [prev, next] = pager.querySelectorAll("button");
+  prev.disabled = page[name] === 0;
+  next.disabled = page[name] >= pages - 1;
+}
+
+function showSummary() {
+  for (const el of document.querySelectorAll("[data-key]")) el.textContent = manifest[el.dataset.key];
+  const notice = document.getElementById("ban-notice");
+  const items  = notice.querySelector(".title + div");
+  items.replaceChildren();
+  manifest.new_bans.forEach(([value, count], i) => {
+    const code = document.createElement("code"), what = document.createElement("span");
+    code.textContent = value;
+    what.style.color = "var(--muted)";
+    what.textContent = ` (${count} ${value.includes("/") ? "offenders" : "hits"})`;
+    if (i) items.append(" · ");
+    items.append(code, what);
+  });
+  notice.style.display = manifest.new_bans.length ? "flex" : "none";
+}
+
+async function refresh() {
+  try {
+    const res  = await fetch("data/index.json", {cache: "no-store"});
+    const next = await res.json();
+    if (manifest && next.generated === manifest.generated) return;
+    manifest = next;
+    showSummary();
+    await show("top");
+    await Promise.all(["ranges", "decisions", "hits"].map(show));
+  } catch (err) {
+    console.error(err);
+  }
+}
+
+for (const pager of document.querySelectorAll(".pager")) {
+  pager.addEventListener("click", (ev) => {
+    const step = Number(ev.target.dataset.step);
+    if (!step || !manifest) return;
+    page[pager.dataset.table] += step;
+    show(pager.dataset.table);
+  });
+}
+refresh();
+setInterval(refresh, REFRESH_MS);
+"""
+
+def write_dashboard(db, decisions, new_bans, state):
+    """Save state, then write the data shards, data/index.json and the page shell.
+
+    Every file is replaced atomically, and index.json only after the
+    shards it lists, so Caddy never serves half a page or a missing shard.
+    """
+    save_state(state)
+    DATA_DIR.mkdir(exist_ok=True)
+    summary, tables = dashboard_data(db, decisions, new_bans, state)
+    summary["pages"] = {name: write_shards(name, rows) for name, rows in tables.items()}
+    write_file(DATA_DIR / "index.json", json.dumps(summary, separators=(",", ":")).encode())
+    for name, pages in summary["pages"].items():
+        prune_shards(name, pages)
+    write_file(OUTPUT_FILE, render_html().encode())
+
+# ── Follow mode ───────────────────────────────────────────────────────────────
+
+def follow(state, db):
+    """Run resident: ban hits as they arrive and re-render on a debounce.
+
+    The journal and logs are first caught up from STATE_FILE as in a
+    one-shot run, then endlessh-go is followed through `journalctl -f` and
+    HONEYPOT_LOGS through inotify (polled if that is unavailable). Returns
+    when journalctl exits or on SIGTERM, with state saved.
+    """
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    decisions   = get_crowdsec_decisions()
+    new_bans    = ban_new_hits(state, db, extend_hits(get_endlessh_hits(state, db), get_honeypot_hits(state)), decisions)
+    recent_bans = [(time.time(), ip, count) for ip, count in new_bans]
+    write_dashboard(db, decisions, new_bans, state)
+    rendered = synced = time.monotonic()
+    dirty    = False
+
+    journal = follow_endlessh_journal(state.get("journal_cursor"))
+    watch   = watch_logs(HONEYPOT_LOGS)
+    sources = [journal.stdout] + ([watch] if watch is not None else [])
+    pending = b""
+    print(f"Following {ENDLESSH_UNIT} and {HONEYPOT_LOGS}")
+    try:
+        while True:
+            now = time.monotonic()
+            deadlines = [synced + FOLLOW_DECISIONS_SECONDS, rendered + FOLLOW_IDLE_SECONDS]
+            if dirty:
+                deadlines.append(rendered + FOLLOW_RENDER_SECONDS)
+            if watch is None:
+                deadlines.append(now + FOLLOW_POLL_SECONDS)
+            ready, _, _ = select.select(sources, [], [], max(0, min(deadlines) - now))
+
+            # The last batch's table is done with, so ids start over rather
+            # than growing with every address seen since startup
+            forget_ips()
+            hits = new_hits()
+            if journal.stdout in ready:
+                chunk = os.read(journal.stdout.fileno(), 65536)
+                if not chunk:
+                    print(f"Warning: journalctl exited with status {journal.wait()}")
+                    return
+                *lines, pending = (pending + chunk).split(b"\n")
+                for line in lines:
+                    parse_journal_entry(line, state, hits)
+            if watch is None or watch in ready:
+                if watch is not None:
+                    drain(watch)
+                extend_hits(hits, get_honeypot_hits(state))
+            if hits["time"]:
+                new_bans = ban_new_hits(state, db, hits, decisions)
+                recent_bans += [(time.time(), ip, count) for ip, count in new_bans]
+                dirty = True
+
+            now = time.monotonic()
+            if now - synced >= FOLLOW_DECISIONS_SECONDS:
+                decisions = get_crowdsec_decisions()
+                synced, dirty = now, True
+            if (dirty and now - rendered >= FOLLOW_RENDER_SECONDS) or now - rendered >= FOLLOW_IDLE_SECONDS:
+                recent_bans = [b for b in recent_bans if b[0] > time.time() - BAN_NOTICE_SECONDS]
+                write_dashboard(db, decisions, [(ip, count) for _, ip, count in recent_bans], state)
+                rendered, dirty = now, False
+    finally:
+        journal.terminate()
+        journal.wait()
+        save_state(state)
+
 # ── Main ──────────────────────────────────────────────────────────────────────
 
 if __name__ == "__main__":
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
     state = load_state()
+    db    = open_hits()
+    get_cscli_config(state)
 
-    endlessh  = get_endlessh_hits()
-    honeypot  = get_honeypot_hits()
-    decisions = get_crowdsec_decisions()
-
-    already_banned = {d["ip"] for d in decisions}
-    new_bans = auto_ban_repeat_offenders(honeypot, already_banned)
-
-    if new_bans:
-        state["last_ban_time"]     = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        state["total_ever_banned"] = state.get("total_ever_banned", 0) + len(new_bans)
-        save_state(state)
-        decisions = get_crowdsec_decisions()
+    if "--follow" in sys.argv[1:]:
+        follow(state, db)
+        sys.exit(1)   # journalctl went away; systemd restarts us
 
-    html = render_html(endlessh, honeypot, decisions, new_bans, state)
-    OUTPUT_FILE.write_text(html)
+    endlessh  = get_endlessh_hits(state, db)
+    honeypot  = get_honeypot_hits(state)
+    decisions = get_crowdsec_decisions()
+    new_bans  = ban_new_hits(state, db, extend_hits(extend_hits(new_hits(), endlessh), honeypot), decisions)
+    write_dashboard(db, decisions, new_bans, state)
     print(
         f"Dashboard written — "
-        f"{len(endlessh)} tarpit, {len(honeypot)} honeypot, "
+        f"{len(endlessh['time'])} new tarpit, {len(honeypot['time'])} new honeypot, "
         f"{len(decisions)} active bans, {len(new_bans)} new auto-bans"
     )
-
@@ -76,6 +76,8 @@ in
     rotate     = 7;
     daily      = true;
     compress   = true;
+    # The dashboard finishes reading yesterday's file from <name>.log.1
+    delaycompress = true;
     missingok  = true;
     notifempty = true;
   };
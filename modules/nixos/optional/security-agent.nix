@@ -0,0 +1,45 @@
+# modules/nixos/optional/security-agent.nix
+#
+# Push agent for the eridanus security dashboard. Runs the dashboard's probes
+# locally every 5 minutes and POSTs the signed report to eridanus, which then
+# stops pulling this host over SSH while its reports keep arriving.
+#
+# Import from a host to opt in. Needs the shared key from eridanus at
+# /persist/etc/security-dashboard/ingest.key, and networking.hostName must
+# match the host's name in the dashboard's HOSTS list.
+{ config, pkgs, ... }:
+let
+  agentScript = pkgs.writeScript "security-agent" ''
+    #!${pkgs.python3}/bin/python3
+    ${builtins.readFile ../../../hosts/eridanus/generate-security-dashboard.py}
+  '';
+in
+{
+  systemd.services.security-agent = {
+    description = "Push security report to the eridanus dashboard";
+    after       = [ "network-online.target" ];
+    wants       = [ "network-online.target" ];
+    path = with pkgs; [
+      audit          # for aureport/ausearch
+      bash           # sh for batched and aide/sudo probes
+      coreutils
+      gawk           # audit row filter
+      gnugrep        # sudo probe filter
+      procps         # for uptime
+    ];
+    serviceConfig = {
+      Type      = "oneshot";
+      ExecStart = "${agentScript} --agent http://10.40.40.117:8091/report --name ${config.networking.hostName}";
+    };
+  };
+
+  systemd.timers.security-agent = {
+    description = "Push security report every 5 minutes";
+    wantedBy    = [ "timers.target" ];
+    timerConfig = {
+      OnBootSec       = "2min";
+      OnUnitActiveSec = "5min";
+      Persistent      = true;
+    };
+  };
+}